@@ -0,0 +1,223 @@
+"""
+benchmark_extractor.py — Benchmark et contrôle de non-régression de team_extractor
+
+Corpus : les raw_title réels de products.json, plus des inflations synthétiques
+(×10, ×100) où chaque copie reçoit un suffixe unique pour ne pas être dédupliquée.
+
+Usage :
+  python benchmark_extractor.py                  # corpus ×1, ×10, ×100 + accord golden
+  python benchmark_extractor.py --scale 1 10     # échelles choisies
+  python benchmark_extractor.py --batch          # mesurer aussi extract_products_info
+  python benchmark_extractor.py --freeze         # régénérer extraction_golden.json
+
+Le fichier golden fige (team_key, season, type, sleeve) pour chaque titre : une
+optimisation de team_extractor ne doit pas changer ces résultats.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# Force UTF-8 on Windows
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from config import PRODUCTS_JSON
+from team_extractor import (
+    extract_product_info, extract_products_info,
+    find_team_exact, find_team_fuzzy, parse_title, team_index,
+)
+
+GOLDEN_FILE   = Path(__file__).parent / "extraction_golden.json"
+GOLDEN_FIELDS = ("team_key", "season", "type", "sleeve")
+
+
+# ── Corpus ────────────────────────────────────────────────────────────────────
+def load_corpus(path: Path = PRODUCTS_JSON) -> list[tuple[str, str]]:
+    """Paires (raw_title, version) de products.json, dans l'ordre du fichier."""
+    with open(path, encoding="utf-8") as f:
+        products = json.load(f)
+    return [(p.get("raw_title", ""), p.get("version", "fan")) for p in products]
+
+
+def inflate(corpus: list[tuple[str, str]], factor: int) -> list[tuple[str, str]]:
+    """
+    Multiplie le corpus par factor. Les copies reçoivent un suffixe " [k]" :
+    titres tous distincts (pas de déduplication), sans saison ni alias parasite.
+    """
+    inflated = list(corpus)
+    for k in range(1, factor):
+        inflated.extend((f"{title} [{k}]", version) for title, version in corpus)
+    return inflated
+
+
+# ── Mesures ───────────────────────────────────────────────────────────────────
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def bench_single(corpus: list[tuple[str, str]]) -> dict:
+    """extract_product_info titre par titre : débit et latences p50/p99."""
+    latencies = []
+    start = time.perf_counter()
+    for title, version in corpus:
+        t0 = time.perf_counter()
+        extract_product_info(title, version)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "titles":     len(corpus),
+        "elapsed_s":  elapsed,
+        "titles_s":   len(corpus) / elapsed if elapsed else 0.0,
+        "p50_us":     _percentile(latencies, 50) * 1e6,
+        "p99_us":     _percentile(latencies, 99) * 1e6,
+    }
+
+
+def bench_stages(corpus: list[tuple[str, str]]) -> dict:
+    """
+    Temps cumulé par étape, dans l'ordre d'extract_team_from_title :
+    parse (parse_title), exact (titre entier), cleaned (exact sur le titre
+    nettoyé), fuzzy (titre nettoyé puis titre entier).
+    """
+    totals = {"parse": 0.0, "exact": 0.0, "cleaned": 0.0, "fuzzy": 0.0}
+    counts = {"exact": 0, "cleaned": 0, "fuzzy": 0, "unmatched": 0}
+
+    for title, _ in corpus:
+        t0 = time.perf_counter()
+        cleaned = parse_title(title)["team_span"]
+        t1 = time.perf_counter()
+        totals["parse"] += t1 - t0
+
+        if not title:
+            counts["unmatched"] += 1
+            continue
+
+        result = find_team_exact(title)
+        t2 = time.perf_counter()
+        totals["exact"] += t2 - t1
+        if result:
+            counts["exact"] += 1
+            continue
+
+        result = find_team_exact(cleaned) if cleaned else None
+        t3 = time.perf_counter()
+        totals["cleaned"] += t3 - t2
+        if result:
+            counts["cleaned"] += 1
+            continue
+
+        result = (find_team_fuzzy(cleaned) if cleaned else None) or find_team_fuzzy(title)
+        totals["fuzzy"] += time.perf_counter() - t3
+        counts["fuzzy" if result else "unmatched"] += 1
+
+    return {"seconds": totals, "resolved_by": counts}
+
+
+def bench_batch(corpus: list[tuple[str, str]], workers: Optional[int]) -> dict:
+    """extract_products_info sur tout le corpus (sans cache)."""
+    start = time.perf_counter()
+    extract_products_info(corpus, workers=workers)
+    elapsed = time.perf_counter() - start
+    return {
+        "titles":    len(corpus),
+        "elapsed_s": elapsed,
+        "titles_s":  len(corpus) / elapsed if elapsed else 0.0,
+    }
+
+
+# ── Golden ────────────────────────────────────────────────────────────────────
+def freeze_golden(corpus: list[tuple[str, str]], path: Path = GOLDEN_FILE) -> int:
+    """Fige les résultats actuels de l'extracteur (un titre par ligne)."""
+    entries = []
+    for title, version in dict.fromkeys(corpus):
+        info = extract_product_info(title, version)
+        entries.append({"title": title, "version": version, **{f: info[f] for f in GOLDEN_FIELDS}})
+
+    lines = ",\n".join(json.dumps(e, ensure_ascii=False) for e in entries)
+    path.write_text(f"[\n{lines}\n]\n", encoding="utf-8")
+    return len(entries)
+
+
+def check_golden(path: Path = GOLDEN_FILE) -> dict:
+    """Taux d'accord champ par champ entre l'extracteur actuel et le golden."""
+    with open(path, encoding="utf-8") as f:
+        golden = json.load(f)
+
+    agree = {f: 0 for f in GOLDEN_FIELDS}
+    mismatches = []
+    for entry in golden:
+        info = extract_product_info(entry["title"], entry["version"])
+        diff = {f: (entry[f], info[f]) for f in GOLDEN_FIELDS if entry[f] != info[f]}
+        for f in GOLDEN_FIELDS:
+            if f not in diff:
+                agree[f] += 1
+        if diff:
+            mismatches.append({"title": entry["title"], "diff": diff})
+
+    return {"total": len(golden), "agree": agree, "mismatches": mismatches}
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EliteKits — Benchmark de team_extractor")
+    parser.add_argument("--products", type=Path, default=PRODUCTS_JSON)
+    parser.add_argument("--golden",   type=Path, default=GOLDEN_FILE)
+    parser.add_argument("--scale",    type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--batch",    action="store_true", help="Mesurer aussi extract_products_info")
+    parser.add_argument("--workers",  type=int, default=None, help="Processus pour --batch")
+    parser.add_argument("--freeze",   action="store_true", help="Régénérer le fichier golden")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.products)
+    if not corpus:
+        print(f"Corpus vide : {args.products}")
+        sys.exit(1)
+
+    if args.freeze:
+        n = freeze_golden(corpus, args.golden)
+        print(f"[OK] Golden figé : {n} titres -> {args.golden}")
+        sys.exit(0)
+
+    # Charger l'index des équipes hors mesure (coût de démarrage, pas d'extraction)
+    team_index()
+
+    print("=" * 72)
+    print(f"Corpus : {len(corpus)} titres ({args.products.name})")
+    for factor in args.scale:
+        data = inflate(corpus, factor)
+        single = bench_single(data)
+        print(f"\n×{factor:<4} {single['titles']:>7} titres | {single['titles_s']:>9.0f} titres/s"
+              f" | p50 {single['p50_us']:>7.1f} µs | p99 {single['p99_us']:>8.1f} µs")
+        if args.batch:
+            batch = bench_batch(data, args.workers)
+            print(f"       batch : {batch['elapsed_s']:.2f}s | {batch['titles_s']:>9.0f} titres/s")
+
+    stages = bench_stages(corpus)
+    print("\nTemps par étape (corpus ×1) :")
+    for stage, seconds in stages["seconds"].items():
+        print(f"  {stage:<8} {seconds * 1000:>9.1f} ms")
+    print("Résolus par : " + ", ".join(f"{k}={v}" for k, v in stages["resolved_by"].items()))
+
+    if not args.golden.exists():
+        print(f"\nPas de golden ({args.golden}) : lancer avec --freeze")
+        sys.exit(0)
+
+    report = check_golden(args.golden)
+    print(f"\nAccord avec le golden ({report['total']} titres) :")
+    for field, n in report["agree"].items():
+        print(f"  {field:<9} {n / report['total'] * 100:>6.2f}%")
+    for m in report["mismatches"][:20]:
+        print(f"  [DIFF] {m['title'][:50]} {m['diff']}")
+    print("=" * 72)
+
+    sys.exit(1 if report["mismatches"] else 0)
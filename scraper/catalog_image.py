@@ -0,0 +1,478 @@
+"""
+catalog_image.py — Image binaire du catalogue, partagée entre les workers de l'API
+
+database_builder.py l'écrit à côté de products.json ; search_engine.py l'ouvre en
+mmap (lecture seule). Les pages viennent du cache du système de fichiers et sont
+partagées par tous les workers uvicorn : ajouter un worker n'ajoute que les
+agrégats (facettes, autocomplete), pas une copie du catalogue.
+
+Sans image à jour, search_engine.py construit la même image en mémoire depuis
+products.json : dans les deux cas l'index est colonnaire (chaînes internées,
+colonnes et postings en tableaux indexés par ordinal, JSON pré-sérialisé) et les
+dicts des produits ne sont construits qu'à la demande.
+
+Format (little-endian) :
+  MAGIC (8 octets) | taille du répertoire (uint32) | répertoire JSON | sections
+Le répertoire décrit les sections (offset, taille, typecode) et les petites
+métadonnées : champs des produits, valeurs des postings, empreinte du contenu.
+Sections :
+  strings, string_offsets        table des chaînes (UTF-8)
+  col:<champ>                    identifiant de chaîne par produit (COLUMN_FIELDS)
+  matched, boost                 colonnes scalaires
+  docs, doc_offsets, spans       JSON de chaque produit et position de chaque champ
+  id_order                       ordinaux triés par id (recherche dichotomique)
+  sort:<tri>, order:<tri>        clé de tri par produit et permutation triée (SORT_KEYS)
+  post:<champ>, post_offsets:<champ>          postings des filtres
+  text:<champ>, text_starts:<champ>, …        champs texte normalisés (full-text)
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
+from functools import lru_cache
+from json.encoder import encode_basestring
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from team_extractor import normalize_text
+
+MAGIC   = b"EKCAT\x00\x00\x02"
+NULL_ID = 0xFFFFFFFF          # champ absent du produit
+
+# Champs indexés en postings : valeur → ordinaux des produits
+POSTING_FIELDS = ("team_key", "version", "country", "league", "season", "type")
+# Champs texte normalisés du fallback full-text
+TEXT_FIELDS    = ("team", "tags", "raw")
+# Champs chaîne stockés en colonnes (facettes, autocomplete, curseurs)
+COLUMN_FIELDS  = ("id", "team", "team_short", "team_key", "league", "country", "season", "type", "version")
+
+POSTING_CACHE_SIZE = 256   # postings décodés gardés par worker
+
+
+def relevance_boost(p: dict) -> int:
+    """Part du score d'un produit de l'équipe résolue qui ne dépend que du produit."""
+    # Booster les matchs haute confiance
+    s = int(p.get("confidence_score", 0) * 20)
+    # Booster par saison récente
+    try:
+        yr = int((p.get("season") or "0")[:4])
+        s += max(0, yr - 2010)
+    except ValueError:
+        pass
+    return s
+
+
+def season_year(p: dict) -> int:
+    """Année de début de la saison (0 si absente), comme CAST(substr(season, 1, 4)) en SQL."""
+    digits = re.match(r"\d*", (p.get("season") or "")[:4]).group()
+    return int(digits) if digits else 0
+
+
+def created_timestamp(p: dict) -> int:
+    """created_at en secondes depuis l'epoch (UTC si sans fuseau), 0 si absent ou invalide."""
+    try:
+        created = datetime.fromisoformat(p.get("created_at") or "")
+    except ValueError:
+        return 0
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return int(created.timestamp())
+
+
+# Tris de /api/search (?sort=…) : clé croissante par produit, départage par ordre du
+# catalogue. "relevance" ordonne les produits de l'équipe résolue (boost décroissant).
+SORT_KEYS = {
+    "relevance":  lambda p: -relevance_boost(p),
+    "newest":     lambda p: -created_timestamp(p),
+    "price":      lambda p: int(p.get("price") or 0),
+    "price_desc": lambda p: -int(p.get("price") or 0),
+    "season":     lambda p: -season_year(p),
+}
+
+
+def json_fragments(products: list[dict]) -> list[dict[str, str]]:
+    """Fragments '"clé":valeur' pré-sérialisés de chaque produit, par champ."""
+    prefixes: dict[str, str] = {}
+    encoded_values: dict[tuple, str] = {}   # valeurs répétées : alias, prix, scores…
+    fragments = []
+    for p in products:
+        frag = {}
+        for key, value in p.items():
+            prefix = prefixes.get(key)
+            if prefix is None:
+                prefix = prefixes[key] = encode_basestring(key) + ":"
+            if type(value) is str:
+                frag[key] = prefix + encode_basestring(value)
+            elif type(value) is list and all(type(v) is str for v in value):
+                items   = (list, *value)
+                encoded = encoded_values.get(items)
+                if encoded is None:
+                    encoded = encoded_values[items] = "[" + ",".join(map(encode_basestring, value)) + "]"
+                frag[key] = prefix + encoded
+            elif type(value) in (int, float, bool):
+                scalar  = (type(value), value)
+                encoded = encoded_values.get(scalar)
+                if encoded is None:
+                    encoded = encoded_values[scalar] = json.dumps(value)
+                frag[key] = prefix + encoded
+            else:
+                frag[key] = prefix + json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        fragments.append(frag)
+    return fragments
+
+
+def fragments_json(frag: dict[str, str]) -> bytes:
+    """JSON complet d'un produit à partir de ses fragments."""
+    return ("{" + ",".join(frag.values()) + "}").encode("utf-8")
+
+
+# ── Écriture ──────────────────────────────────────────────────────────────────
+def build_catalog_image(products: list[dict]) -> bytes:
+    """Contenu de l'image du catalogue pour products (dans l'ordre du catalogue)."""
+    sections: dict[str, tuple[bytes, str]] = {}
+
+    def add(name: str, data, typecode: str = "B"):
+        sections[name] = (data.tobytes() if isinstance(data, array) else bytes(data), typecode)
+
+    # ── Table des chaînes et colonnes ─────────────────────────────────────────
+    string_ids: dict[str, int] = {}
+    string_offsets = array("I", [0])
+    strings = bytearray()
+
+    def sid(value) -> int:
+        if value is None:
+            return NULL_ID
+        k = string_ids.get(value)
+        if k is None:
+            k = string_ids[value] = len(string_ids)
+            strings.extend(value.encode("utf-8"))
+            string_offsets.append(len(strings))
+        return k
+
+    # ── Colonnes et postings, en un seul passage sur les produits ────────────
+    # postings : valeur → ordinaux croissants, valeurs dans l'ordre de première apparition
+    columns  = {field: array("I") for field in COLUMN_FIELDS}
+    matched, boost = array("B"), array("i")
+    sort_values = {name: array("q") for name in SORT_KEYS}
+    postings = {field: {} for field in POSTING_FIELDS}
+    texts    = {field: {} for field in TEXT_FIELDS}
+    normalize = lru_cache(maxsize=None)(normalize_text)   # tags et équipes très répétés
+    for i, p in enumerate(products):
+        for field, column in columns.items():
+            column.append(sid(p.get(field)))
+        matched.append(1 if p.get("matched") else 0)
+        boost.append(relevance_boost(p))
+        for name, key in SORT_KEYS.items():
+            sort_values[name].append(key(p))
+        for field, values in postings.items():
+            value = p.get(field)
+            if value:
+                values.setdefault(value, []).append(i)
+        texts["team"].setdefault(normalize(p.get("team") or ""), []).append(i)
+        texts["raw"].setdefault(normalize(p.get("raw_title") or ""), []).append(i)
+        for tag in p.get("tags") or []:
+            ids = texts["tags"].setdefault(normalize(tag), [])
+            if not ids or ids[-1] != i:
+                ids.append(i)
+
+    for field, column in columns.items():
+        add(f"col:{field}", column, "I")
+    add("strings", strings)
+    add("string_offsets", string_offsets, "I")
+    add("matched", matched)
+    add("boost", boost, "i")
+
+    # ── Tris précalculés : clé par produit et permutation triée ──────────────
+    # (tri stable : à clé égale, ordre du catalogue)
+    for name, values in sort_values.items():
+        add(f"sort:{name}", values, "q")
+        add(f"order:{name}", array("I", sorted(range(len(products)), key=values.__getitem__)), "I")
+
+    # ── JSON des produits et position de chaque champ (projections) ───────────
+    fragments = json_fragments(products)
+    fields    = list(dict.fromkeys(key for frag in fragments for key in frag))
+    field_pos = {f: k for k, f in enumerate(fields)}
+    docs, doc_offsets = bytearray(), array("Q", [0])
+    spans  = array("I", [0]) * (2 * len(fields) * len(products))
+    digest = hashlib.blake2b(digest_size=12)
+    for i, frag in enumerate(fragments):
+        doc = fragments_json(frag)
+        digest.update(doc)
+        docs.extend(doc)
+        doc_offsets.append(len(docs))
+        pos = 1
+        for key, text in frag.items():
+            size = len(text) if text.isascii() else len(text.encode("utf-8"))
+            k = 2 * (i * len(fields) + field_pos[key])
+            spans[k], spans[k + 1] = pos, pos + size
+            pos += size + 1
+    add("docs", docs)
+    add("doc_offsets", doc_offsets, "Q")
+    add("spans", spans, "I")
+
+    ids = [p["id"].encode("utf-8") for p in products]
+    add("id_order", array("I", sorted(range(len(products)), key=ids.__getitem__)), "I")
+
+    # ── Postings des filtres ──────────────────────────────────────────────────
+    for field, values in postings.items():
+        _add_postings(add, f"post:{field}", f"post_offsets:{field}", values)
+
+    # ── Champs texte normalisés : blob "\n"-séparé + postings ─────────────────
+    for field, values in texts.items():
+        blob, starts = bytearray(b"\n"), array("I")
+        for value in values:
+            starts.append(len(blob))
+            blob.extend(value.encode("utf-8") + b"\n")
+        add(f"text:{field}", blob)
+        add(f"text_starts:{field}", starts, "I")
+        _add_postings(add, f"text_post:{field}", f"text_post_offsets:{field}", values)
+
+    # ── Assemblage : en-tête, répertoire, sections alignées sur 8 octets ──────
+    layout, offset = {}, 0
+    for name, (data, typecode) in sections.items():
+        layout[name] = [offset, len(data), typecode]
+        offset += len(data) + (-len(data) % 8)
+    directory = json.dumps({
+        "count":    len(products),
+        "fields":   fields,
+        "digest":   digest.hexdigest(),
+        "postings": {field: list(values) for field, values in postings.items()},
+        "sections": layout,
+    }, ensure_ascii=False).encode("utf-8")
+
+    header = MAGIC + struct.pack("<I", len(directory)) + directory
+    parts  = [header, bytes(-len(header) % 8)]
+    for data, _ in sections.values():
+        parts += [data, bytes(-len(data) % 8)]
+    return b"".join(parts)
+
+
+def write_catalog_image(products: list[dict], path: Path):
+    """Écrit l'image du catalogue (écriture atomique : fichier temporaire puis os.replace)."""
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(build_catalog_image(products))
+    os.replace(tmp, path)
+
+
+def _add_postings(add, name: str, offsets_name: str, postings: dict[str, list[int]]):
+    ordinals, offsets = array("I"), array("I", [0])
+    for ids in postings.values():
+        ordinals.extend(ids)
+        offsets.append(len(ordinals))
+    add(name, ordinals, "I")
+    add(offsets_name, offsets, "I")
+
+
+# ── Lecture ───────────────────────────────────────────────────────────────────
+class CatalogImage:
+    """Vue en lecture seule sur une image du catalogue (bytes ou mmap partagé entre processus)."""
+
+    def __init__(self, buf):
+        if buf[:8] != MAGIC:
+            raise ValueError("contenu invalide (pas une image du catalogue)")
+        self.buf = buf
+        (size,) = struct.unpack_from("<I", self.buf, 8)
+        directory = json.loads(bytes(self.buf[12:12 + size]))
+        base = 12 + size + (-(12 + size) % 8)
+
+        self.count:  int       = directory["count"]
+        self.fields: list[str] = directory["fields"]
+        self.digest: str       = directory["digest"]
+        self._posting_values: dict[str, list[str]] = directory["postings"]
+        self._sections = {
+            name: (base + offset, length, typecode)
+            for name, (offset, length, typecode) in directory["sections"].items()
+        }
+        self._view = memoryview(self.buf)
+
+        self._strings        = self.section("strings")
+        self._string_offsets = self.section("string_offsets")
+        self._docs           = self.section("docs")
+        self._doc_offsets    = self.section("doc_offsets")
+        self._spans          = self.section("spans")
+        self._id_order       = self.section("id_order")
+        self._field_pos      = {f: k for k, f in enumerate(self.fields)}
+        self._columns        = {f: self.section(f"col:{f}") for f in COLUMN_FIELDS}
+        self.matched         = self.section("matched")
+        self.boost           = self.section("boost")
+        self.sort_keys       = {name: self.section(f"sort:{name}") for name in SORT_KEYS}
+        self.orders          = {name: self.section(f"order:{name}") for name in SORT_KEYS}
+
+    @classmethod
+    def open(cls, path: Path) -> "CatalogImage":
+        """Image d'un fichier, mappée en mémoire (pages partagées entre workers)."""
+        with open(path, "rb") as f:
+            if os.name == "nt":
+                # Windows : un fichier mappé ne peut pas être remplacé par os.replace
+                return cls(f.read())
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def section(self, name: str) -> memoryview:
+        start, length, typecode = self._sections[name]
+        view = self._view[start:start + length]
+        return view if typecode == "B" else view.cast(typecode)
+
+    def section_bounds(self, name: str) -> tuple[int, int]:
+        start, length, _ = self._sections[name]
+        return start, start + length
+
+    # ── Colonnes ──────────────────────────────────────────────────────────────
+    def string(self, k: int) -> Optional[str]:
+        if k == NULL_ID:
+            return None
+        return str(self._strings[self._string_offsets[k]:self._string_offsets[k + 1]], "utf-8")
+
+    def value(self, field: str, i: int) -> Optional[str]:
+        return self.string(self._columns[field][i])
+
+    def rows(self, fields: tuple[str, ...] = COLUMN_FIELDS):
+        """Lignes (dicts) des colonnes demandées, champs absents omis comme dans products.json."""
+        strings = {}
+        columns = [(f, self._columns[f]) for f in fields if f != "matched"]
+        with_matched = "matched" in fields
+        for i in range(self.count):
+            row = {}
+            for field, column in columns:
+                k = column[i]
+                if k != NULL_ID:
+                    value = strings.get(k)
+                    if value is None:
+                        value = strings[k] = self.string(k)
+                    row[field] = value
+            if with_matched:
+                row["matched"] = bool(self.matched[i])
+            yield row
+
+    # ── Produits ──────────────────────────────────────────────────────────────
+    def doc(self, i: int) -> bytes:
+        return self._docs[self._doc_offsets[i]:self._doc_offsets[i + 1]].tobytes()
+
+    def project(self, i: int, fields: Optional[tuple[str, ...]] = None) -> bytes:
+        """JSON du produit i (restreint à fields), découpé dans son document."""
+        if fields is None:
+            return self.doc(i)
+        start = self._doc_offsets[i]
+        row   = 2 * i * len(self.fields)
+        parts = []
+        for f in fields:
+            k = self._field_pos.get(f)
+            if k is None:
+                continue
+            a, b = self._spans[row + 2 * k], self._spans[row + 2 * k + 1]
+            if b:
+                parts.append(self._docs[start + a:start + b])
+        return b"{" + b",".join(parts) + b"}"
+
+    def ordinal(self, product_id: str) -> Optional[int]:
+        """Ordinal d'un produit par son id (dichotomie sur id_order)."""
+        target = product_id.encode("utf-8")
+        column = self._columns["id"]
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k   = column[self._id_order[mid]]
+            if self._strings[self._string_offsets[k]:self._string_offsets[k + 1]].tobytes() < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.value("id", self._id_order[lo]) == product_id:
+            return self._id_order[lo]
+        return None
+
+    # ── Postings ──────────────────────────────────────────────────────────────
+    def postings(self, field: str) -> "ImagePostings":
+        return ImagePostings(self, field)
+
+    def text_field(self, field: str) -> "ImageTextField":
+        return ImageTextField(self, field)
+
+
+class ImagePostings(Mapping):
+    """valeur → frozenset d'ordinaux, décodés à la demande (cache LRU borné)."""
+
+    def __init__(self, image: CatalogImage, field: str):
+        self._values   = {v: k for k, v in enumerate(image._posting_values[field])}
+        self._ordinals = image.section(f"post:{field}")
+        self._offsets  = image.section(f"post_offsets:{field}")
+        self._decode   = lru_cache(maxsize=POSTING_CACHE_SIZE)(self._decode_uncached)
+
+    def _decode_uncached(self, k: int) -> frozenset[int]:
+        return frozenset(self._ordinals[self._offsets[k]:self._offsets[k + 1]])
+
+    def __getitem__(self, value: str) -> frozenset[int]:
+        return self._decode(self._values[value])
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class ImageTextField:
+    """
+    Champ texte normalisé : valeurs distinctes concaténées dans un blob, pour
+    que la recherche de sous-chaîne se fasse en C (find sur le mmap ou les
+    bytes) plutôt qu'en Python produit par produit.
+    """
+
+    def __init__(self, image: CatalogImage, field: str):
+        self._buf              = image.buf
+        self._start, self._end = image.section_bounds(f"text:{field}")
+        self._starts   = image.section(f"text_starts:{field}")
+        self._ordinals = image.section(f"text_post:{field}")
+        self._offsets  = image.section(f"text_post_offsets:{field}")
+
+    def _ids(self, k: int) -> frozenset[int]:
+        return frozenset(self._ordinals[self._offsets[k]:self._offsets[k + 1]])
+
+    def ids_equal(self, token: str) -> frozenset[int]:
+        i = self._buf.find(b"\n" + token.encode("utf-8") + b"\n", self._start, self._end)
+        if i == -1:
+            return frozenset()
+        return self._ids(bisect_right(self._starts, i + 1 - self._start) - 1)
+
+    def ids_containing(self, token: str) -> frozenset[int]:
+        """Union des produits dont une valeur contient token."""
+        needle = token.encode("utf-8")
+        find   = self._buf.find
+        matched = []
+        i = find(needle, self._start, self._end)
+        while i != -1:
+            k = bisect_right(self._starts, i - self._start) - 1
+            end = self._start + (self._starts[k + 1] if k + 1 < len(self._starts) else self._end - self._start) - 1
+            if i + len(needle) <= end:
+                matched.append(self._ids(k))
+                i = find(needle, end + 1, self._end)      # valeur suivante
+            else:
+                i = find(needle, i + 1, self._end)        # chevauchement de deux valeurs
+        if len(matched) == 1:
+            return matched[0]
+        return frozenset().union(*matched)
+
+
+class ImageProducts(Sequence):
+    """products[i] → dict du produit, décodé à la demande (chemins hors recherche)."""
+
+    def __init__(self, image: CatalogImage):
+        self._image = image
+
+    def __len__(self) -> int:
+        return self._image.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self._image.doc(i))
@@ -17,7 +17,9 @@ LOGS_DIR.mkdir(parents=True, exist_ok=True)
 RAW_DATA_FILE  = DATA_DIR / "raw_catalog.json"   # données brutes du scraping
 PRODUCTS_JSON  = ROOT_DIR / "products.json"       # base de données produits (frontend)
 PRODUCTS_DB    = DATA_DIR / "products.db"         # SQLite pour requêtes avancées
+CATALOG_IMAGE  = DATA_DIR / "catalog.img"         # image mmap partagée par les workers de l'API
 UNMATCHED_CSV  = DATA_DIR / "unmatched.csv"       # produits non identifiés
+EXTRACT_CACHE  = DATA_DIR / "extraction_cache.db" # cache des extractions de titres
 UPDATE_LOG     = LOGS_DIR / "update.log"
 
 # ── Catalogues Yupoo ──────────────────────────────────────────────────────────
@@ -107,6 +109,31 @@ API = {
         "https://elitekits.netlify.app",
         # Ajouter l'URL Netlify réelle ici
     ],
+    # Cache LRU des résultats de /api/search (invalidé à chaque rechargement de l'index)
+    "search_cache_size": 2048,   # nombre max de requêtes en cache (0 = désactivé)
+    "search_cache_ttl":  300,    # secondes
+    # Rechargement à chaud : intervalle de surveillance de products.json / products.db
+    "reload_interval":   10,     # secondes (0 = désactivé)
+    # Cache HTTP des endpoints qui ne changent qu'au rechargement de l'index
+    # (/api/filters, /api/teams, /api/stats, /api/product, /api/search sans requête)
+    "cache_control": "public, max-age=60, stale-while-revalidate=600",
+    # Backend de recherche : "memory" (products.json en mémoire) ou "sqlite"
+    # (products.db + FTS5 : mémoire constante quelle que soit la taille du catalogue)
+    "backend":          "memory",
+    # Backend "memory" : ouvrir data/catalog.img en mmap (partagé entre les workers
+    # uvicorn) plutôt que de reconstruire l'index depuis products.json dans chacun
+    "catalog_image":    True,
+    "sqlite_pool_size": 4,           # connexions en lecture seule par worker
+    "sqlite_mmap_size": 256 << 20,   # octets mappés en mémoire par connexion
+    # Travail CPU des recherches (fuzzy, scoring, rendu) : pool de threads borné,
+    # hors de la boucle asyncio. Au-delà, 503 + Retry-After plutôt qu'une latence
+    # qui explose pour toutes les requêtes du worker.
+    "search_workers":     4,     # threads de recherche par worker uvicorn
+    "search_max_pending": 64,    # requêtes en cours + en attente avant refus (503)
+    "search_budget":      2.0,   # secondes max par requête, attente comprise (0 = illimité)
+    "retry_after":        1,     # en-tête Retry-After des 503, en secondes
+    # POST /api/search/batch : nombre max de recherches par lot
+    "search_batch_max":   20,
 }
 
 # ── Seuils de confiance ───────────────────────────────────────────────────────
@@ -1,11 +1,13 @@
 """
-database_builder.py — Construit products.json et products.db depuis les données scrapées
+database_builder.py — Construit products.json, products.db et catalog.img depuis les données scrapées
 
 Usage : python database_builder.py [--input raw_catalog.json] [--output products.json]
 """
 import csv
+import hashlib
 import json
 import logging
+import os
 import sqlite3
 import sys
 from datetime import datetime
@@ -18,10 +20,11 @@ if hasattr(sys.stdout, 'reconfigure'):
 
 sys.path.insert(0, str(Path(__file__).parent))
 from config import (
-    RAW_DATA_FILE, PRODUCTS_JSON, PRODUCTS_DB,
-    UNMATCHED_CSV, PRICES_EUR, CONFIDENCE,
+    RAW_DATA_FILE, PRODUCTS_JSON, PRODUCTS_DB, CATALOG_IMAGE,
+    UNMATCHED_CSV, EXTRACT_CACHE, PRICES_EUR, CONFIDENCE,
 )
-from team_extractor import extract_product_info
+from catalog_image import SORT_KEYS, write_catalog_image
+from team_extractor import ExtractionCache, extract_product_info, extract_products_info, normalize_text
 
 # ── Logging ───────────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -35,9 +38,10 @@ log = logging.getLogger("database_builder")
 
 
 # ── Construction d'un produit depuis un album Yupoo ───────────────────────────
-def build_product(album: dict, catalog: dict, product_index: int) -> dict:
+def build_product(album: dict, catalog: dict, product_index: int, info: Optional[dict] = None) -> dict:
     """
     Construit un objet produit structuré depuis les données d'un album Yupoo.
+    info : résultat d'extract_product_info déjà calculé (sinon extrait ici).
     """
     version   = catalog.get("version", "fan")
     title     = album.get("title", "")
@@ -45,7 +49,8 @@ def build_product(album: dict, catalog: dict, product_index: int) -> dict:
     cover_url = album.get("cover_url") or (photos[0] if photos else "")
 
     # Extraire les informations de l'équipe et du maillot
-    info = extract_product_info(title, version)
+    if info is None:
+        info = extract_product_info(title, version)
 
     # Déterminer le prix selon la version et les manches
     price = _get_price(version, info.get("sleeve", "short"))
@@ -165,17 +170,39 @@ def build_database(
     raw_data: dict,
     output_json: Path = PRODUCTS_JSON,
     output_db: Path = PRODUCTS_DB,
+    output_image: Path = CATALOG_IMAGE,
     unmatched_csv: Path = UNMATCHED_CSV,
+    workers: Optional[int] = None,
+    cache_path: Optional[Path] = EXTRACT_CACHE,
 ) -> list:
     """
-    Construit products.json et products.db depuis les données brutes du scraper.
+    Construit products.json, products.db et l'image mmap du catalogue (API)
+    depuis les données brutes du scraper.
+    workers    : processus pour l'extraction des titres (None = tous les cœurs).
+    cache_path : cache SQLite des extractions (None = pas de cache).
     Retourne la liste complète des produits.
     """
     products    = []
     unmatched   = []
     product_idx = 0
-
-    for catalog in raw_data.get("catalogs", []):
+    catalogs    = raw_data.get("catalogs", [])
+
+    # ── Extraction groupée (titres dédupliqués, multi-cœurs) ──────────────────
+    pairs = [
+        (album.get("title", ""), catalog.get("version", "fan"))
+        for catalog in catalogs
+        for album in catalog.get("albums", [])
+    ]
+    log.info(f"Extraction : {len(pairs)} titres ({len({t for t, _ in pairs})} uniques)")
+    if cache_path is not None:
+        with ExtractionCache(cache_path) as cache:
+            infos = extract_products_info(pairs, workers=workers, cache=cache)
+            log.info(f"Cache d'extraction : {cache.stats()}")
+    else:
+        infos = extract_products_info(pairs, workers=workers)
+    infos = iter(infos)
+
+    for catalog in catalogs:
         albums     = catalog.get("albums", [])
         log.info(f"\nTraitement : {catalog['catalog_name']} ({len(albums)} albums)")
 
@@ -183,7 +210,7 @@ def build_database(
         unmatched_count = 0
 
         for album in albums:
-            product = build_product(album, catalog, product_idx)
+            product = build_product(album, catalog, product_idx, info=next(infos))
             products.append(product)
             product_idx += 1
 
@@ -211,16 +238,24 @@ def build_database(
     ))
 
     # ── Sauvegarder products.json ─────────────────────────────────────────────
-    output_json.write_text(
+    # Écriture atomique : l'API (rechargement à chaud) ne lit jamais un fichier partiel
+    tmp_json = output_json.with_suffix(f".{os.getpid()}.tmp")
+    tmp_json.write_text(
         json.dumps(products, ensure_ascii=False, indent=2),
         encoding="utf-8",
     )
+    os.replace(tmp_json, output_json)
     log.info(f"\n[OK] products.json : {len(products)} produits -> {output_json}")
 
     # ── Sauvegarder products.db (SQLite) ──────────────────────────────────────
     _save_to_sqlite(products, output_db)
     log.info(f"[OK] products.db -> {output_db}")
 
+    # ── Sauvegarder catalog.img (image partagée par les workers de l'API) ─────
+    # Écrite après products.json : l'API ne l'utilise que si elle est plus récente
+    write_catalog_image(products, output_image)
+    log.info(f"[OK] catalog.img -> {output_image}")
+
     # ── Sauvegarder unmatched.csv ─────────────────────────────────────────────
     if unmatched and CONFIDENCE.get("log_unmatched"):
         with open(unmatched_csv, "w", encoding="utf-8", newline="") as f:
@@ -249,8 +284,14 @@ def build_database(
 
 
 def _save_to_sqlite(products: list, db_path: Path):
-    """Sauvegarde les produits dans une base SQLite."""
-    conn = sqlite3.connect(db_path)
+    """
+    Sauvegarde les produits dans une base SQLite, avec l'index plein texte
+    (FTS5) et le JSON de chaque produit utilisés par le backend SQLite de l'API.
+    La base est écrite à côté puis remplace l'ancienne (lecteurs jamais bloqués).
+    """
+    tmp_path = db_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_path)
     cur  = conn.cursor()
 
     # Créer la table
@@ -278,9 +319,11 @@ def _save_to_sqlite(products: list, db_path: Path):
             tags            TEXT,    -- JSON array
             confidence_score REAL,
             matched         INTEGER,
-            created_at      TEXT
+            created_at      TEXT,
+            {sort_columns}
+            doc             TEXT     -- JSON compact du produit (servi tel quel par l'API)
         )
-    """)
+    """.format(sort_columns="".join(f"sort_{name} INTEGER, " for name in SORT_KEYS)))
 
     # Créer les index pour la recherche rapide
     cur.execute("CREATE INDEX IF NOT EXISTS idx_team    ON products (team_key)")
@@ -288,6 +331,11 @@ def _save_to_sqlite(products: list, db_path: Path):
     cur.execute("CREATE INDEX IF NOT EXISTS idx_country ON products (country)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_season  ON products (season)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_version ON products (version)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_type    ON products (type)")
+    # Tris de ?sort= : clés de catalog_image.SORT_KEYS (les mêmes que l'image), indexées
+    # pour que la navigation sans requête lise les premières lignes au lieu de tout trier
+    for name in SORT_KEYS:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_sort_{name} ON products (sort_{name})")
 
     # Insérer les produits
     rows = []
@@ -315,16 +363,45 @@ def _save_to_sqlite(products: list, db_path: Path):
             p.get("confidence_score", 0.0),
             1 if p.get("matched") else 0,
             p.get("created_at", ""),
+            *(key(p) for key in SORT_KEYS.values()),
+            json.dumps(p, ensure_ascii=False, separators=(",", ":")),
         ))
 
-    cur.executemany("""
-        INSERT INTO products VALUES (
-            ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?
+    columns = len(cur.execute("PRAGMA table_info(products)").fetchall())
+    cur.executemany(f"INSERT INTO products VALUES ({','.join('?' * columns)})", rows)
+
+    # Empreinte du contenu : ETag HTTP identique quel que soit le backend de l'API
+    digest = hashlib.blake2b(digest_size=12)
+    for row in rows:
+        digest.update(row[-1].encode("utf-8"))
+    cur.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("INSERT INTO meta VALUES ('catalog_digest', ?)", (digest.hexdigest(),))
+
+    # Index plein texte (trigrammes = recherche de sous-chaînes) sur les textes normalisés
+    try:
+        cur.execute("""
+            CREATE VIRTUAL TABLE products_fts USING fts5(
+                team_norm, tags_norm, raw_norm, tokenize = 'trigram'
+            )
+        """)
+        cur.executemany(
+            "INSERT INTO products_fts (rowid, team_norm, tags_norm, raw_norm) VALUES (?,?,?,?)",
+            (
+                (
+                    rowid,
+                    normalize_text(p.get("team") or ""),
+                    "\n".join(normalize_text(t) for t in p.get("tags") or []),
+                    normalize_text(p.get("raw_title") or ""),
+                )
+                for rowid, p in enumerate(products, start=1)
+            ),
         )
-    """, rows)
+    except sqlite3.OperationalError as e:
+        log.warning(f"FTS5 indisponible ({e}) : products.db sans index plein texte")
 
     conn.commit()
     conn.close()
+    os.replace(tmp_path, db_path)
 
 
 def load_raw_data(path: Path = RAW_DATA_FILE) -> Optional[dict]:
@@ -352,6 +429,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="EliteKits — Database Builder")
     parser.add_argument("--input",  type=Path, default=RAW_DATA_FILE)
     parser.add_argument("--output", type=Path, default=PRODUCTS_JSON)
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'extraction (défaut : tous les cœurs)")
+    parser.add_argument("--no-cache", action="store_true", help="Ré-extraire tous les titres sans le cache")
     args = parser.parse_args()
 
     log.info("Chargement des données brutes...")
@@ -362,4 +441,9 @@ if __name__ == "__main__":
     total_albums = sum(len(c.get("albums", [])) for c in raw.get("catalogs", []))
     log.info(f"{total_albums} albums à traiter")
 
-    build_database(raw, output_json=args.output)
+    build_database(
+        raw,
+        output_json=args.output,
+        workers=args.workers,
+        cache_path=None if args.no_cache else EXTRACT_CACHE,
+    )
@@ -5,7 +5,8 @@ Usage : python search_engine.py
         ou : uvicorn search_engine:app --host 0.0.0.0 --port 8001 --reload
 
 Endpoints :
-  GET  /api/search?q=PSG&version=fan&country=France&page=1
+  GET  /api/search?q=PSG&version=fan&country=France&page=1&sort=newest
+  POST /api/search/batch         (plusieurs recherches, un aller-retour)
   GET  /api/suggest?q=par
   GET  /api/teams
   GET  /api/filters
@@ -15,12 +16,21 @@ Endpoints :
   POST /admin/rescrape
   POST /admin/fix-team           (correction manuelle)
 """
+import base64
+import gzip
+import heapq
+import itertools
 import json
 import logging
 import os
+import re
 import secrets
 import sys
-from collections import Counter
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from collections import Counter, OrderedDict, defaultdict
 from pathlib import Path
 from typing import Optional
 
@@ -29,15 +39,30 @@ if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
 import uvicorn
+try:
+    import orjson   # optionnel : encodage JSON plus rapide
+except ImportError:
+    orjson = None
+try:
+    import brotli   # optionnel : compression br en plus de gzip
+except ImportError:
+    brotli = None
 from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from rapidfuzz import fuzz, process
+from pydantic import BaseModel, Field
 
 sys.path.insert(0, str(Path(__file__).parent))
-from config import PRODUCTS_JSON, UNMATCHED_CSV, API, LOGS_DIR
-from team_extractor import TEAM_DATABASE, _ALIAS_INDEX, normalize_text
+from catalog_image import (
+    POSTING_FIELDS, SORT_KEYS, CatalogImage, ImageProducts, ImageTextField,
+    build_catalog_image, write_catalog_image,
+)
+from config import PRODUCTS_JSON, PRODUCTS_DB, CATALOG_IMAGE, UNMATCHED_CSV, API, LOGS_DIR
+from team_extractor import (
+    TEAM_DATABASE, TYPE_MAPPING, FUZZY_THRESHOLD_QUERY,
+    match_alias_fuzzy, normalize_text, team_index,
+)
 
 # ── Logging ───────────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -68,113 +93,1161 @@ app.add_middleware(
 security = HTTPBasic()
 
 # ── Index en mémoire ──────────────────────────────────────────────────────────
+_NO_IDS: frozenset = frozenset()
+
+# Scores du fallback full-text, par token de la requête
+TEXT_SCORE_TEAM     = 50   # token contenu dans le nom d'équipe
+TEXT_SCORE_TAG      = 30   # token égal à un tag
+TEXT_SCORE_IN_TAG   = 15   # token contenu dans un tag
+TEXT_SCORE_RAW      = 10   # token contenu dans le titre brut
+# Score d'un produit de l'équipe résolue : TEAM_MATCH_SCORE + relevance_boost(produit)
+TEAM_MATCH_SCORE    = 100
+
+
+# Projections de /api/search (?view=…) : champs renvoyés par produit
+VIEWS = {
+    "card": ("id", "team_short", "season", "type", "version", "price", "thumbnail"),
+}
+
+
+def _dumps(value) -> str:
+    """JSON compact, même rendu que les réponses FastAPI."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps_bytes(value) -> bytes:
+    """JSON compact encodé en UTF-8 : orjson s'il est installé, sinon json."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _dumps(value).encode("utf-8")
+
+
+# ── Cache HTTP : ETag, Cache-Control, compression ────────────────────────────
+COMPRESS_MIN_SIZE = 1024   # octets : en dessous, la compression ne vaut pas le coût
+HTTP_BODIES_MAX   = 4096   # corps pré-compressés gardés par génération d'index
+
+
+def _qvalue(params: list[str]) -> float:
+    """Poids q d'un élément d'Accept-Encoding ("gzip;q=0" → 0.0), 1.0 s'il est absent."""
+    for param in params:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0   # poids illisible : encodage ignoré plutôt qu'imposé
+    return 1.0
+
+
+def _pick_encoding(request: Request) -> Optional[str]:
+    """Meilleur encodage accepté par le client (br si disponible, sinon gzip)."""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, *params = part.split(";")
+        if _qvalue(params) > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+    """Compression maximale pour les corps mis en cache, rapide pour les réponses à la volée."""
+    if encoding == "br":
+        return brotli.compress(body, quality=4 if fast else 11)
+    return gzip.compress(body, compresslevel=5 if fast else 9)
+
+
+def _json_response(body: bytes, request: Optional[Request] = None) -> Response:
+    """Réponse JSON déjà sérialisée (contourne jsonable_encoder), compressée si possible."""
+    headers = {}
+    if request is not None and len(body) >= COMPRESS_MIN_SIZE:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = _pick_encoding(request)
+        if encoding:
+            body = _compress(body, encoding, fast=True)
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match contient-il etag ? (comparaison faible, comme le veut la RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+# Numéro de génération : change à chaque (re)construction d'un index
+_generations = itertools.count(1)
+
+SUGGEST_LIMIT = 10
+
+
+class _SuggestNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: dict[str, "_SuggestNode"] = {}
+        self.top: tuple[int, ...] = ()
+
+
+class _SuggestTrie:
+    """
+    Trie des textes normalisés de l'autocomplete. Chaque nœud garde les rangs
+    de ses SUGGEST_LIMIT meilleures suggestions (sous-arbre compris) : une
+    requête coûte O(longueur du préfixe), quelle que soit la taille du catalogue.
+
+    Les alias sont insérés tels quels (recherche par préfixe) ; les noms courts,
+    ligues et pays le sont avec tous leurs suffixes (recherche « contient »).
+    """
+
+    def __init__(self):
+        self.root = _SuggestNode()
+        self.suggestions: list[dict] = []   # triées : rang = position
+
+    def lookup(self, q_norm: str) -> list[dict]:
+        node = self.root
+        for ch in q_norm:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [self.suggestions[rank] for rank in node.top]
+
+    @classmethod
+    def build(cls, entries: list[tuple[dict, list[str], list[str]]]) -> "_SuggestTrie":
+        """
+        entries : (suggestion, préfixes, sous-chaînes) dans l'ordre de priorité
+        historique ; le rang final suit (équipes d'abord, label, ordre d'insertion).
+        """
+        trie  = cls()
+        order = sorted(
+            range(len(entries)),
+            key=lambda i: (0 if entries[i][0]["type"] == "team" else 1, entries[i][0]["label"], i),
+        )
+        trie.suggestions = [entries[i][0] for i in order]
+        rank_of = {i: rank for rank, i in enumerate(order)}
+
+        own: dict[int, set[int]] = defaultdict(set)   # id(nœud) → rangs propres
+        for i, (_, prefixes, substrings) in enumerate(entries):
+            rank = rank_of[i]
+            own[id(trie.root)].add(rank)          # requête vide : tout matche
+            keys = list(prefixes)
+            for text in substrings:
+                keys.extend(text[k:] for k in range(len(text)))
+            for key in keys:
+                node = trie.root
+                for ch in key:
+                    node = node.children.setdefault(ch, _SuggestNode())
+                own[id(node)].add(rank)
+
+        # Remonter les meilleurs rangs des feuilles vers la racine (post-ordre)
+        stack = [(trie.root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            ranks = own.get(id(node), set()).union(*(c.top for c in node.children.values()))
+            node.top = tuple(heapq.nsmallest(SUGGEST_LIMIT, ranks))
+        return trie
+
+
+def _build_suggest_trie(team_rows, leagues: list[str], countries: list[str]) -> _SuggestTrie:
+    """
+    Suggestions de l'autocomplete, dédupliquées dans l'ordre historique :
+    équipes par alias, équipes présentes dans la base, ligues, pays.
+    team_rows : produits (ou lignes équivalentes) dans l'ordre du catalogue.
+    Le trie est réutilisé d'un rechargement à l'autre si ces entrées n'ont pas changé.
+    """
+    team_rows = tuple(dict.fromkeys(
+        (p.get("team_key", ""), p.get("team_short", ""), p.get("team"), p.get("league", ""), p.get("country", ""))
+        for p in team_rows
+    ))
+    return _suggest_trie(team_rows, tuple(leagues), tuple(countries))
+
+
+@lru_cache(maxsize=1)
+def _suggest_trie(team_rows: tuple, leagues: tuple, countries: tuple) -> _SuggestTrie:
+    entries = {}   # clé de déduplication → (suggestion, préfixes, sous-chaînes)
+
+    # 1. Équipes dont le nom ou alias commence par la requête
+    teams = team_index()
+    for alias, alias_norm in zip(teams.aliases, teams.alias_norms):
+        team_key = teams.alias_index[alias]
+        if team_key not in entries:
+            team_data = TEAM_DATABASE.get(team_key, {})
+            entries[team_key] = ({
+                "type":    "team",
+                "label":   team_data.get("canonical_name", team_key),
+                "short":   team_data.get("short_name", ""),
+                "league":  team_data.get("league", ""),
+                "country": team_data.get("country", ""),
+            }, [], [])
+        entries[team_key][1].append(alias_norm)
+
+    # 2. Équipes disponibles dans la base (nom court contenant la requête)
+    for team_key, team_short, team, league, country in team_rows:
+        if not team_key:
+            continue
+        if team_key not in entries:
+            entries[team_key] = ({
+                "type":    "team",
+                "label":   team_short if team is None else team,
+                "short":   team_short,
+                "league":  league,
+                "country": country,
+            }, [], [])
+        short_norm = normalize_text(team_short)
+        if short_norm not in entries[team_key][2]:
+            entries[team_key][2].append(short_norm)
+
+    # 3. Ligues, 4. Pays (contenant la requête)
+    for kind, labels in (("league", leagues), ("country", countries)):
+        for label in labels:
+            if label not in entries:
+                entries[label] = ({"type": kind, "label": label}, [], [normalize_text(label)])
+
+    return _SuggestTrie.build(list(entries.values()))
+
+
 class SearchIndex:
-    """Index de recherche en mémoire chargé depuis products.json."""
+    """
+    Index de recherche colonnaire (voir catalog_image) : vue sur l'image mmap du
+    catalogue (catalog.img, partagée entre les workers) si elle est à jour, sinon
+    sur la même image construite en mémoire depuis products.json.
+    """
 
     def __init__(self):
-        self.products: list[dict] = []
-        self.by_id: dict[str, dict] = {}
+        self.products = []                   # ImageProducts : dicts décodés à la demande
+        self.image: Optional[CatalogImage] = None
+        self.image_path: Optional[Path] = None   # catalog.img si l'index en est une vue
+        self.ordinals: dict[str, int] = {}   # id → position dans self.products
         self.teams: list[str] = []        # noms canoniques
         self.team_keys: list[str] = []    # clés normalisées
         self.leagues: list[str] = []
         self.countries: list[str] = []
         self.seasons: list[str] = []
         self.versions: list[str] = []
+        # champ → valeur → ordinaux (position dans self.products)
+        self.postings: dict[str, dict[str, frozenset[int]]] = {}
+        # Textes normalisés pour le fallback full-text
+        self.text_team: Optional[ImageTextField] = None
+        self.text_tags: Optional[ImageTextField] = None
+        self.text_raw:  Optional[ImageTextField] = None
+        self.boost = []                      # relevance_boost de chaque produit
+        # Tris précalculés (SORT_KEYS) : clé de chaque produit, ordinaux dans l'ordre du tri
+        self.sort_keys: dict[str, memoryview] = {}
+        self.orders: dict[str, memoryview] = {}
+        self.unmatched_ids: list[int] = []
+        self.suggest: _SuggestTrie = _SuggestTrie()
+        # Facettes matérialisées une fois par chargement
+        self.team_records: list[dict] = []   # triées par nom, avec "count"
+        self.team_counts: dict[str, int] = {}   # team_key → nombre de produits
+        self.stats: dict = {}
+        # Cache HTTP : ETag du contenu et corps (compressés) des endpoints statiques
+        self.etag = 'W/"0"'
+        self.http_bodies: dict[str, dict] = {}
+        self.field_names: frozenset[str] = frozenset()
+        self.generation = 0
+        self.source_stamp: Optional[tuple] = None   # état des fichiers au chargement
         self.loaded = False
 
-    def load(self, path: Path = PRODUCTS_JSON) -> int:
-        """Charge et indexe les produits depuis products.json."""
+    def load(self, path: Path = PRODUCTS_JSON, image: Optional[Path] = CATALOG_IMAGE) -> int:
+        """Charge le catalogue : image partagée si elle est à jour, sinon products.json."""
+        if image is not None and API.get("catalog_image", True) and _image_is_current(image, path):
+            try:
+                return self.load_image(image)
+            except (OSError, ValueError) as e:
+                log.warning(f"Image du catalogue illisible ({e}) : chargement de {path.name}")
+
         if not path.exists():
             log.warning(f"products.json introuvable : {path}")
             return 0
 
+        self.source_stamp = _catalog_stamp()
         with open(path, encoding="utf-8") as f:
             self.products = json.load(f)
 
-        self.by_id = {p["id"]: p for p in self.products}
-
-        # Construire les listes pour les filtres et l'autocomplete
-        teams_seen   = set()
-        leagues_seen = set()
-        countries_seen = set()
-        seasons_seen = set()
-        versions_seen = set()
-
-        for p in self.products:
-            if p.get("team_short") and p.get("matched"):
-                teams_seen.add(p["team"])
-            if p.get("league"):
-                leagues_seen.add(p["league"])
-            if p.get("country"):
-                countries_seen.add(p["country"])
-            if p.get("season"):
-                seasons_seen.add(p["season"])
-            if p.get("version"):
-                versions_seen.add(p["version"])
-
-        self.teams     = sorted(teams_seen)
-        self.leagues   = sorted(leagues_seen)
-        self.countries = sorted(countries_seen)
-        self.seasons   = sorted(seasons_seen, reverse=True)
-        self.versions  = sorted(versions_seen)
+        self.reindex()
+        log.info(f"Index chargé : {len(self)} produits, {len(self.teams)} équipes")
+        return len(self)
+
+    def load_image(self, path: Path = CATALOG_IMAGE) -> int:
+        """Ouvre l'image du catalogue : postings, colonnes et JSON restent dans le mmap."""
+        self.source_stamp = _catalog_stamp()
+        self._attach(CatalogImage.open(path))
+        self.image_path = path
+        log.info(f"Image du catalogue ouverte : {len(self)} produits, {len(self.teams)} équipes ({path.name})")
+        return len(self)
+
+    def reindex(self):
+        """
+        Reconstruit l'index depuis self.products (dicts, après load ou correction) :
+        l'image est construite en mémoire et les dicts sont libérés.
+        """
+        self._attach(CatalogImage(build_catalog_image(self.products)))
+        self.image_path = None
+
+    def _attach(self, image: CatalogImage):
+        """Branche l'index sur une image (fichier mappé ou construite en mémoire)."""
+        self.image     = image
+        self.products  = ImageProducts(image)
+        self.ordinals  = _ImageOrdinals(image)
+        self.postings  = {field: image.postings(field) for field in POSTING_FIELDS}
+        self.text_team = image.text_field("team")
+        self.text_tags = image.text_field("tags")
+        self.text_raw  = image.text_field("raw")
+        self.boost     = image.boost
+        self.sort_keys = image.sort_keys
+        self.orders    = image.orders
+        self.field_names = frozenset(image.fields)
+        # ETag = empreinte du contenu : identique entre workers et redémarrages
+        self.etag        = f'W/"{image.digest}"'
+        self._index_facets(image.rows(_FACET_FIELDS))
+
+    def _index_facets(self, rows):
+        """
+        Facettes, autocomplete, fiches équipes et statistiques.
+        rows : colonnes _FACET_FIELDS de chaque produit, dans l'ordre du catalogue.
+        """
+        rows = list(rows)
+        self.teams     = sorted({p["team"] for p in rows if p.get("team_short") and p.get("matched")})
+        self.leagues   = sorted(self.postings["league"])
+        self.countries = sorted(self.postings["country"])
+        self.seasons   = sorted(self.postings["season"], reverse=True)
+        self.versions  = sorted(self.postings["version"])
+        self.unmatched_ids = [i for i, p in enumerate(rows) if not p.get("matched")]
+        self.suggest   = _build_suggest_trie(rows, self.leagues, self.countries)
+        self.team_records = self._build_team_records(rows)
+        self.team_counts  = {t["key"]: t["count"] for t in self.team_records}
+        self.stats     = self._build_stats(rows)
+        _typo_index()   # dictionnaire des fautes de frappe, construit au premier chargement
+        self.http_bodies = {}
+        self.generation = next(_generations)
         self.loaded    = True
 
-        log.info(f"Index chargé : {len(self.products)} produits, {len(self.teams)} équipes")
+    def _build_team_records(self, rows: list[dict]) -> list[dict]:
+        """Une fiche par équipe matchée (premier produit du catalogue), avec son nombre de produits."""
+        records = {}
+        for p in rows:
+            key = p.get("team_key")
+            if not p.get("matched") or not key or key in records:
+                continue
+            records[key] = {
+                "key":      key,
+                "name":     p["team"],
+                "short":    p.get("team_short", ""),
+                "league":   p.get("league", ""),
+                "country":  p.get("country", ""),
+                "count":    len(self.ids_equal("team_key", key)),
+            }
+        return sorted(records.values(), key=lambda t: t["name"])
+
+    def _build_stats(self, rows: list[dict]) -> dict:
+        """Histogrammes par version et par ligue, compteurs de matching."""
+        total   = len(rows)
+        matched = total - len(self.unmatched_ids)
+
+        version_counts = Counter(p.get("version", "?") for p in rows)
+        league_counts  = Counter(p.get("league", "?") for p in rows if p.get("matched"))
+        country_counts = Counter(p.get("country", "?") for p in rows if p.get("matched"))
+
+        return {
+            "total_products":  total,
+            "matched":         matched,
+            "unmatched":       total - matched,
+            "match_rate":      round(matched / total * 100, 1) if total else 0,
+            "by_version":      dict(version_counts.most_common()),
+            "top_leagues":     dict(league_counts.most_common(10)),
+            "by_league":       dict(league_counts.most_common()),
+            "by_country":      dict(country_counts.most_common()),
+            "total_teams":     len(self.teams),
+        }
+
+    # ── Postings ──────────────────────────────────────────────────────────────
+    def ids_equal(self, field: str, value: str) -> frozenset[int]:
+        """Produits dont le champ vaut exactement value."""
+        return self.postings.get(field, {}).get(value, _NO_IDS)
+
+    def ids_containing(self, field: str, needle: str, ignore_case: bool = True) -> frozenset[int]:
+        """
+        Produits dont le champ contient needle (union des postings des valeurs
+        qui matchent : on parcourt les valeurs distinctes, pas les produits).
+        """
+        if ignore_case:
+            needle = needle.lower()
+        postings = self.postings.get(field, {})
+        matching = [
+            postings[value] for value in postings
+            if needle in (value.lower() if ignore_case else value)
+        ]
+        if len(matching) == 1:
+            return matching[0]
+        return frozenset().union(*matching)
+
+    def select(
+        self,
+        version: Optional[str] = None,
+        country: Optional[str] = None,
+        league: Optional[str] = None,
+        season: Optional[str] = None,
+        jersey_type: Optional[str] = None,
+        team_key: Optional[str] = None,
+    ) -> Optional[frozenset[int]]:
+        """
+        Intersection des postings des filtres fournis.
+        Retourne None si aucun filtre (= tout le catalogue).
+        """
+        selections = []
+        if version:
+            selections.append(self.ids_equal("version", version))
+        if country:
+            selections.append(self.ids_containing("country", country))
+        if league:
+            selections.append(self.ids_containing("league", league))
+        if season:
+            selections.append(self.ids_containing("season", season, ignore_case=False))
+        if jersey_type:
+            selections.append(self.ids_equal("type", jersey_type))
+        if team_key:
+            selections.append(self.ids_equal("team_key", team_key))
+        if not selections:
+            return None
+
+        # Intersecter en partant du plus petit ensemble : coût ∝ taille du résultat
+        selections.sort(key=len)
+        ids = selections[0]
+        for other in selections[1:]:
+            if not ids:
+                break
+            ids = ids & other
+        return ids
+
+    def text_scores(self, tokens: set[str]) -> Counter:
+        """
+        Scores du fallback full-text (ordinal → score), par recherche dans les
+        champs normalisés précalculés. Seuls les produits avec un score > 0 figurent.
+        """
+        scores = Counter()
+        for token in tokens:
+            if len(token) < 2:
+                continue
+            for ids, points in (
+                (self.text_team.ids_containing(token), TEXT_SCORE_TEAM),
+                (self.text_tags.ids_equal(token),      TEXT_SCORE_TAG),
+                (self.text_tags.ids_containing(token), TEXT_SCORE_IN_TAG),
+                (self.text_raw.ids_containing(token),  TEXT_SCORE_RAW),
+            ):
+                for i in ids:
+                    scores[i] += points
+        return scores
+
+    def project(self, i: int, fields: Optional[tuple[str, ...]] = None) -> bytes:
+        """JSON du produit i (restreint à fields), découpé dans son JSON pré-sérialisé."""
+        return self.image.project(i, fields)
+
+    # ── Interface commune aux backends (voir SqliteIndex) ─────────────────────
+    def __len__(self) -> int:
         return len(self.products)
 
-    def reload(self):
-        """Recharge l'index depuis le disque."""
-        self.load()
+    def search(
+        self, q: str, version: Optional[str] = None, country: Optional[str] = None,
+        league: Optional[str] = None, season: Optional[str] = None,
+        jersey_type: Optional[str] = None, page: int = 1, per_page: int = 60,
+        cursor: Optional[str] = None, shared: Optional[dict] = None,
+        sort: Optional[str] = None,
+    ) -> dict:
+        """Recherche sur cet index (voir _search_ids)."""
+        return _search_ids(
+            q, version, country, league, season, jersey_type, page, per_page,
+            snapshot=self, cursor=cursor, shared=shared, sort=sort,
+        )
+
+    def first_ids(self, limit: int, sort: Optional[str] = None):
+        """Les limit premiers produits du catalogue, ou du tri demandé (navigation sans requête)."""
+        if sort:
+            return self.orders[sort][:limit].tolist()
+        return range(min(limit, len(self.products)))
+
+    def render_items(self, ids, fields: Optional[tuple[str, ...]] = None) -> bytes:
+        """Éléments JSON (séparés par des virgules) des produits ids."""
+        return b",".join([self.project(i, fields) for i in ids])
+
+    def product_doc(self, product_id: str) -> Optional[bytes]:
+        ordinal = self.ordinals.get(product_id)
+        return None if ordinal is None else self.project(ordinal)
+
+    def product_id(self, i: int) -> str:
+        return self.image.value("id", i)
+
+    def products_for(self, ids) -> list[dict]:
+        return [self.products[i] for i in ids]
+
+    def unmatched(self, limit: int) -> tuple[list[dict], int]:
+        return self.products_for(self.unmatched_ids[:limit]), len(self.unmatched_ids)
+
+    def materialize(self, ids: Optional[frozenset[int]]) -> list[dict]:
+        """Produits correspondant aux ordinaux, dans l'ordre du catalogue."""
+        if ids is None:
+            return self.products[:]
+        return [self.products[i] for i in sorted(ids)]
+
+
+# Colonnes de l'image utilisées par les facettes, l'autocomplete et les statistiques
+_FACET_FIELDS = ("team", "team_short", "team_key", "league", "country", "version", "matched")
+
+
+class _ImageOrdinals:
+    """id → ordinal sur l'image (même interface que le dict du mode products.json)."""
+
+    def __init__(self, image: CatalogImage):
+        self._image = image
+
+    def get(self, product_id: str, default=None):
+        ordinal = self._image.ordinal(product_id)
+        return default if ordinal is None else ordinal
+
+    def __contains__(self, product_id: str) -> bool:
+        return self._image.ordinal(product_id) is not None
+
+
+def _image_is_current(image: Path, source: Path) -> bool:
+    """L'image existe et n'est pas plus ancienne que products.json."""
+    try:
+        image_mtime = image.stat().st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return image_mtime >= source.stat().st_mtime_ns
+    except OSError:
+        return True
+
+
+# ── Backend SQLite (products.db) ──────────────────────────────────────────────
+# Score d'un produit de l'équipe résolue (même formule que score_product)
+_TEAM_SCORE_SQL = (
+    "100 + CAST(COALESCE(p.confidence_score, 0) * 20 AS INTEGER)"
+    " + MAX(0, CAST(substr(COALESCE(NULLIF(p.season, ''), '0'), 1, 4) AS INTEGER) - 2010)"
+)
+# Score full-text d'un token (mêmes poids que SearchIndex.text_scores)
+_TOKEN_SCORE_SQL = (
+    f"(instr(products_fts.team_norm, ?) > 0) * {TEXT_SCORE_TEAM}"
+    f" + (instr(char(10) || products_fts.tags_norm || char(10), ?) > 0) * {TEXT_SCORE_TAG}"
+    f" + (instr(products_fts.tags_norm, ?) > 0) * {TEXT_SCORE_IN_TAG}"
+    f" + (instr(products_fts.raw_norm, ?) > 0) * {TEXT_SCORE_RAW}"
+)
+
+# Clés de tri de catalog_image.SORT_KEYS, précalculées et indexées par database_builder
+# ("relevance" : score décroissant)
+_SORT_SQL = {name: f"p.sort_{name}" for name in SORT_KEYS if name != "relevance"}
+
+
+class _ConnectionPool:
+    """Connexions SQLite en lecture seule (mmap), partagées entre les requêtes."""
+
+    def __init__(self, path: Path, size: int, mmap_size: int):
+        import queue
+        import sqlite3
+
+        self._idle = queue.LifoQueue()
+        uri = f"{path.resolve().as_uri()}?mode=ro"
+        for _ in range(max(1, size)):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256)
+            conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+            conn.execute("PRAGMA query_only = ON")
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+class SqliteIndex:
+    """
+    Backend de recherche adossé à products.db (API["backend"] = "sqlite") :
+    recherche via l'index FTS5 et des requêtes préparées sur un pool de
+    connexions en lecture seule, JSON des produits lu dans la base.
+    Seuls les agrégats (facettes, trie d'autocomplete) restent en mémoire :
+    leur taille dépend du nombre d'équipes, pas du nombre de produits.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.teams: list[str] = []
+        self.leagues: list[str] = []
+        self.countries: list[str] = []
+        self.seasons: list[str] = []
+        self.versions: list[str] = []
+        self.suggest: _SuggestTrie = _SuggestTrie()
+        self.team_records: list[dict] = []
+        self.team_counts: dict[str, int] = {}
+        self.stats: dict = {}
+        self.field_names: frozenset[str] = frozenset()
+        self.etag = 'W/"0"'
+        self.http_bodies: dict[str, dict] = {}
+        self.generation = 0
+        self.source_stamp: Optional[tuple] = None
+        self.loaded = False
+        self._pool: Optional[_ConnectionPool] = None
+
+    def load(self, path: Path = PRODUCTS_DB) -> int:
+        """Ouvre products.db et charge les agrégats."""
+        if not path.exists():
+            log.warning(f"products.db introuvable : {path}")
+            return 0
+
+        self.source_stamp = _catalog_stamp()
+        pool = _ConnectionPool(path, API.get("sqlite_pool_size", 4), API.get("sqlite_mmap_size", 256 << 20))
+        with pool.connection() as conn:
+            tables  = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+            if not {"products_fts", "meta"} <= tables or "doc" not in columns:
+                log.error(f"{path} sans index FTS5 : reconstruire avec database_builder.py")
+                return 0
+            if not {f"sort_{name}" for name in SORT_KEYS} <= columns:
+                log.error(f"{path} sans clés de tri : reconstruire avec database_builder.py")
+                return 0
+            self._load_aggregates(conn)
+
+        self._pool      = pool
+        self.generation = next(_generations)
+        self.loaded     = True
+        log.info(f"Index SQLite ouvert : {self.count} produits, {len(self.teams)} équipes ({path.name})")
+        return self.count
+
+    def _load_aggregates(self, conn):
+        """Facettes, statistiques et trie d'autocomplete (équivalents de SearchIndex.reindex)."""
+        def column(sql: str) -> list:
+            return [row[0] for row in conn.execute(sql)]
+
+        def histogram(where: str, column_name: str) -> dict:
+            return dict(conn.execute(
+                f"SELECT {column_name}, COUNT(*) FROM products {where} "
+                f"GROUP BY {column_name} ORDER BY COUNT(*) DESC, MIN(rowid)"
+            ).fetchall())
+
+        self.count     = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        self.teams     = sorted(column("SELECT DISTINCT team FROM products WHERE matched = 1 AND team_short != ''"))
+        self.leagues   = sorted(column("SELECT DISTINCT league FROM products WHERE league != ''"))
+        self.countries = sorted(column("SELECT DISTINCT country FROM products WHERE country != ''"))
+        self.seasons   = sorted(column("SELECT DISTINCT season FROM products WHERE season != ''"), reverse=True)
+        self.versions  = sorted(column("SELECT DISTINCT version FROM products WHERE version != ''"))
+
+        # Première occurrence de chaque (équipe, nom court), dans l'ordre du catalogue
+        team_fields = ("team_key", "team", "team_short", "league", "country")
+        team_rows = [
+            dict(zip(team_fields, row)) for row in conn.execute(
+                "SELECT team_key, team, team_short, league, country, MIN(rowid) FROM products "
+                "WHERE team_key != '' GROUP BY team_key, team_short ORDER BY MIN(rowid)"
+            )
+        ]
+        self.suggest = _build_suggest_trie(team_rows, self.leagues, self.countries)
+
+        counts = dict(conn.execute(
+            "SELECT team_key, COUNT(*) FROM products WHERE team_key != '' GROUP BY team_key"
+        ).fetchall())
+        records = conn.execute(
+            "SELECT team_key, team, team_short, league, country, MIN(rowid) AS first FROM products "
+            "WHERE matched = 1 AND team_key != '' GROUP BY team_key ORDER BY first"
+        ).fetchall()
+        self.team_records = sorted((
+            {"key": key, "name": name, "short": short or "", "league": league or "",
+             "country": country or "", "count": counts.get(key, 0)}
+            for key, name, short, league, country, _ in records
+        ), key=lambda t: t["name"])
+        self.team_counts = {t["key"]: t["count"] for t in self.team_records}
+        _typo_index()   # dictionnaire des fautes de frappe, construit au premier chargement
+
+        matched        = conn.execute("SELECT COUNT(*) FROM products WHERE matched = 1").fetchone()[0]
+        league_counts  = histogram("WHERE matched = 1", "league")
+        self.stats = {
+            "total_products":  self.count,
+            "matched":         matched,
+            "unmatched":       self.count - matched,
+            "match_rate":      round(matched / self.count * 100, 1) if self.count else 0,
+            "by_version":      histogram("", "version"),
+            "top_leagues":     dict(list(league_counts.items())[:10]),
+            "by_league":       league_counts,
+            "by_country":      histogram("WHERE matched = 1", "country"),
+            "total_teams":     len(self.teams),
+        }
+
+        first_doc = conn.execute("SELECT doc FROM products ORDER BY rowid LIMIT 1").fetchone()
+        self.field_names = frozenset(json.loads(first_doc[0])) if first_doc else frozenset()
+        digest = conn.execute("SELECT value FROM meta WHERE key = 'catalog_digest'").fetchone()
+        self.etag = f'W/"{digest[0] if digest else "0"}"'
+
+    # ── Interface commune aux backends (voir SearchIndex) ─────────────────────
+    def __len__(self) -> int:
+        return self.count
+
+    def search(
+        self, q: str, version: Optional[str] = None, country: Optional[str] = None,
+        league: Optional[str] = None, season: Optional[str] = None,
+        jersey_type: Optional[str] = None, page: int = 1, per_page: int = 60,
+        cursor: Optional[str] = None, shared: Optional[dict] = None,
+        sort: Optional[str] = None,
+    ) -> dict:
+        """
+        Même sémantique que _search_ids ; "ids" contient des rowid de products.
+        shared : seules les équipes résolues sont partagées (les filtres sont en SQL).
+        """
+        where, params = [], []
+
+        def add(condition: str, *values):
+            where.append(condition)
+            params.extend(values)
+
+        # ── Filtres stricts (colonnes indexées) ───────────────────────────────
+        if version:
+            add("p.version = ?", version)
+        if country:
+            add("instr(lower(p.country), ?) > 0", country.lower())
+        if league:
+            add("instr(lower(p.league), ?) > 0", league.lower())
+        if season:
+            add("instr(p.season, ?) > 0", season)
+        jersey_type_canonical = _canonical_type(jersey_type)
+        if jersey_type_canonical:
+            add("p.type = ?", jersey_type_canonical)
+
+        # ── Recherche textuelle ───────────────────────────────────────────────
+        score_sql, score_params, join, positive_only = "0", [], "", False
+        if q and q.strip():
+            parsed   = parse_query(q)
+            team_key = _shared(shared, ("team", parsed["team"]),
+                               lambda: resolve_team_query(parsed["team"], self.team_counts))
+            if parsed["season"]:
+                add("instr(p.season, ?) > 0", parsed["season"])
+            if parsed["type"]:
+                add("p.type = ?", parsed["type"])
+
+            if team_key:
+                add("p.team_key = ?", team_key)
+                score_sql = _TEAM_SCORE_SQL
+            else:
+                q_tokens = set(normalize_text(q).split())
+                if q_tokens:
+                    tokens = sorted(t for t in q_tokens if len(t) >= 2)
+                    join, positive_only = "JOIN products_fts ON products_fts.rowid = p.rowid", True
+                    score_sql = " + ".join([_TOKEN_SCORE_SQL] * len(tokens)) or "0"
+                    for token in tokens:
+                        score_params += [token, f"\n{token}\n", token, token]
+                    # Présélection par l'index trigrammes (tokens d'au moins 3 caractères)
+                    if tokens and all(len(t) >= 3 for t in tokens):
+                        add("products_fts MATCH ?", " OR ".join('"' + t.replace('"', '""') + '"' for t in tokens))
+
+        # Clé d'ordre croissante : score décroissant, ou tri demandé
+        sort_sql = _SORT_SQL.get(sort, "0")
+        inner = (
+            f"SELECT p.rowid AS rowid, p.id AS pid, {score_sql} AS score, {sort_sql} AS sort_value "
+            f"FROM products p {join} WHERE {' AND '.join(where) or '1'}"
+        )
+        if positive_only:
+            inner = f"SELECT * FROM ({inner}) WHERE score > 0"
+        inner_params = score_params + params
+        key_sql = "sort_value" if sort in _SORT_SQL else "-score"
+
+        # ── Pagination : page ou reprise après un curseur ─────────────────────
+        start = (page - 1) * per_page
+        cursor_sql, cursor_params = "1", []
+        with self._pool.connection() as conn:
+            if cursor:
+                generation, after, last_id = _decode_cursor(cursor)
+                after = (0, *after)[-2:]
+                if generation != self.generation:
+                    row   = conn.execute("SELECT rowid FROM products WHERE id = ?", (last_id,)).fetchone()
+                    after = (after[0], row[0] if row else -1)
+                cursor_sql    = "(sort_key > ? OR (sort_key = ? AND rowid > ?))"
+                cursor_params = [after[0], after[0], after[1]]
+                start = 0
+
+            rows = conn.execute(
+                f"SELECT rowid, pid, sort_key, total FROM ("
+                f"SELECT rowid, pid, {key_sql} AS sort_key, COUNT(*) OVER () AS total FROM ({inner})) "
+                f"WHERE {cursor_sql} ORDER BY sort_key, rowid LIMIT ? OFFSET ?",
+                inner_params + cursor_params + [per_page + 1, start],
+            ).fetchall()
+            if rows:
+                total = rows[0][3]
+            else:
+                total = conn.execute(f"SELECT COUNT(*) FROM ({inner})", inner_params).fetchone()[0]
+
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            rowid, pid, sort_key, _ = rows[-1]
+            next_cursor = _encode_cursor(self.generation, (sort_key, rowid), pid)
+
+        return {
+            "ids":        [row[0] for row in rows],
+            "total":      total,
+            "page":       page,
+            "per_page":   per_page,
+            "total_pages": (total + per_page - 1) // per_page,
+            "query":      q,
+            "next_cursor": next_cursor,
+        }
+
+    def first_ids(self, limit: int, sort: Optional[str] = None):
+        """Les limit premiers produits du catalogue (rowid consécutifs depuis 1), ou du tri demandé."""
+        if sort in _SORT_SQL:
+            with self._pool.connection() as conn:
+                # Parcours de idx_sort_<tri> : limit lignes lues, sans tri de la table
+                return [row[0] for row in conn.execute(
+                    f"SELECT rowid FROM products p ORDER BY {_SORT_SQL[sort]}, rowid LIMIT ?", (limit,),
+                )]
+        return range(1, min(limit, self.count) + 1)
+
+    def _docs(self, ids) -> list[str]:
+        ids = list(ids)
+        if not ids:
+            return []
+        with self._pool.connection() as conn:
+            docs = dict(conn.execute(
+                f"SELECT rowid, doc FROM products WHERE rowid IN ({','.join('?' * len(ids))})", ids,
+            ).fetchall())
+        return [docs[i] for i in ids]
+
+    def render_items(self, ids, fields: Optional[tuple[str, ...]] = None) -> bytes:
+        docs = self._docs(ids)
+        if fields is None:
+            return ",".join(docs).encode("utf-8")
+        return b",".join(
+            _dumps_bytes({f: product[f] for f in fields if f in product})
+            for product in map(json.loads, docs)
+        )
+
+    def product_doc(self, product_id: str) -> Optional[bytes]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT doc FROM products WHERE id = ?", (product_id,)).fetchone()
+        return row[0].encode("utf-8") if row else None
+
+    def products_for(self, ids) -> list[dict]:
+        return [json.loads(doc) for doc in self._docs(ids)]
 
+    def unmatched(self, limit: int) -> tuple[list[dict], int]:
+        with self._pool.connection() as conn:
+            docs  = conn.execute(
+                "SELECT doc FROM products WHERE matched = 0 ORDER BY rowid LIMIT ?", (limit,),
+            ).fetchall()
+            total = conn.execute("SELECT COUNT(*) FROM products WHERE matched = 0").fetchone()[0]
+        return [json.loads(doc) for (doc,) in docs], total
 
-# Instance globale de l'index
+
+class SearchCache:
+    """
+    Cache LRU des réponses de /api/search, borné en taille et en durée (TTL).
+    Chaque entrée porte la génération de l'index qui l'a produite : un
+    rechargement ou une correction admin la rend obsolète immédiatement.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self._entries: OrderedDict = OrderedDict()   # clé → (génération, expiration, valeur)
+        self._lock   = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: tuple, generation: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_generation, expires_at, value = entry
+                if entry_generation == generation and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, generation: int, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size":        len(self._entries),
+            "maxsize":     self.maxsize,
+            "ttl":         self.ttl,
+            "hits":        self.hits,
+            "misses":      self.misses,
+            "hit_ratio":   round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions":   self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Instance globale de l'index : remplacée (jamais modifiée) à chaque rechargement.
+# Les handlers en prennent une référence locale au début de la requête.
 index = SearchIndex()
+search_cache = SearchCache(API.get("search_cache_size", 2048), API.get("search_cache_ttl", 300))
+
+
+# ── Travail CPU hors de la boucle asyncio ─────────────────────────────────────
+class Overloaded(Exception):
+    """Pool de recherche saturé (file pleine ou budget de temps dépassé) : 503."""
+
+
+class CpuPool:
+    """
+    Exécuteur borné pour le travail CPU des endpoints (recherche, fuzzy, rendu) :
+    la boucle asyncio reste disponible pour les autres requêtes pendant qu'une
+    requête lente s'exécute. Au-delà de max_pending tâches (en cours + en attente)
+    ou de budget secondes, la requête est refusée plutôt que d'allonger la
+    latence de toutes les autres.
+    """
+
+    def __init__(self, workers: int, max_pending: int, budget: float):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._executor   = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="search")
+        self.workers     = max(1, workers)
+        self.max_pending = max_pending
+        self.budget      = budget
+        self._lock       = threading.Lock()
+        self._pending    = 0
+        self.completed = self.rejected = self.timeouts = 0
+
+    async def run(self, fn, *args):
+        """Exécute fn(*args) sur le pool ; lève Overloaded si la file est pleine ou trop lente."""
+        import asyncio
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded(f"{self._pending} requêtes en attente")
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            # En cas de dépassement, une tâche pas encore démarrée est annulée
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.budget or None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise Overloaded(f"budget de {self.budget}s dépassé") from None
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers":     self.workers,
+                "pending":     self._pending,
+                "max_pending": self.max_pending,
+                "budget_s":    self.budget,
+                "completed":   self.completed,
+                "rejected":    self.rejected,
+                "timeouts":    self.timeouts,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+cpu_pool = CpuPool(
+    API.get("search_workers", 4), API.get("search_max_pending", 64), API.get("search_budget", 2.0),
+)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    log.warning(f"Surcharge : {request.url.path} refusée ({exc})")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Serveur surchargé, réessayer dans un instant"},
+        headers={"Retry-After": str(API.get("retry_after", 1))},
+    )
+
+
+# ── Rechargement à chaud ──────────────────────────────────────────────────────
+WATCHED_FILES = (PRODUCTS_JSON, PRODUCTS_DB, CATALOG_IMAGE)
+
+_reload_lock  = threading.Lock()       # une seule construction d'index à la fois
+_watcher_stop = threading.Event()
+
+
+def _catalog_stamp() -> tuple:
+    """(mtime_ns, taille) de chaque fichier surveillé (None si absent)."""
+    stamp = []
+    for path in WATCHED_FILES:
+        try:
+            st = path.stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def swap_index(new):
+    """Remplace l'index global (affectation atomique) ; l'ancien reste valide pour les requêtes en cours."""
+    global index
+    old, index = index, new
+    search_cache.clear()
+    log.info(
+        f"Index échangé : génération {old.generation} -> {new.generation} "
+        f"({len(new)} produits)"
+    )
+
+
+def _new_index():
+    """Index vide du backend configuré : "memory" (products.json) ou "sqlite" (products.db)."""
+    return SqliteIndex() if API.get("backend") == "sqlite" else SearchIndex()
+
+
+def reload_index(path: Optional[Path] = None):
+    """Construit un nouvel index à côté de l'actuel puis l'échange."""
+    with _reload_lock:
+        new = _new_index()
+        if path is None:
+            new.load()
+        else:
+            new.load(path)
+        if not new.loaded:
+            return index
+        swap_index(new)
+        return new
+
+
+def _watch_catalog(interval: float):
+    """
+    Surveille products.json / products.db et recharge l'index quand ils changent.
+    Un changement n'est pris en compte que s'il est stable depuis un intervalle :
+    le builder écrit products.json puis products.db, une seule reconstruction suffit.
+    """
+    pending = failed = None
+    while not _watcher_stop.wait(interval):
+        stamp = _catalog_stamp()
+        if stamp == index.source_stamp or stamp == failed:
+            pending = None
+            continue
+        if stamp != pending:
+            pending = stamp
+            continue
+        try:
+            reload_index()
+            failed = None
+        except Exception as e:
+            failed = stamp
+            log.error(f"Rechargement de l'index échoué (ancien index conservé) : {e}")
 
 
 @app.on_event("startup")
 async def startup():
-    index.load()
+    reload_index()
+    interval = API.get("reload_interval", 10)
+    if interval:
+        _watcher_stop.clear()
+        threading.Thread(
+            target=_watch_catalog, args=(interval,), name="catalog-watcher", daemon=True,
+        ).start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    _watcher_stop.set()
+    cpu_pool.shutdown()
 
 
 # ── Logique de recherche ──────────────────────────────────────────────────────
 
+# Mots-clés de type (toutes les langues de TYPE_MAPPING) et de version reconnus
+# dans les requêtes. Les abréviations CJK d'un seul caractère (主/客) et les mots
+# courants dans les noms de club ("Casa Pia") sont réservés aux titres Yupoo :
+# dans une requête libre ils sont trop ambigus.
+_QUERY_TYPES = {
+    kw: t for kw, t in TYPE_MAPPING.items()
+    if (len(kw) > 1 or kw.isascii()) and kw not in ("casa", "local", "fora")
+}
+_QUERY_VERSIONS = ("retro", "vintage")
+# Mots de remplissage retirés de la requête équipe
+_QUERY_FILLERS = ("maillot", "jersey", "shirt", "kit", "foot", "football", "soccer")
+
+# Limite de mot « latine » : \b échoue entre un caractère CJK et un mot latin
+# ("皇马home") et les mots CJK ne sont pas séparés par des espaces.
+_LATIN = r"0-9a-z\u00c0-\u024f"
+
+
+def _keyword_pattern(kw: str) -> str:
+    if kw.isascii() or any("\u00c0" <= c <= "\u024f" for c in kw):
+        return rf"(?<![{_LATIN}]){re.escape(kw)}(?![{_LATIN}])"
+    return re.escape(kw)
+
+
+# Scanner compilé une fois : saison (2024, 2024-25, 2024/25, 2024/2025, 202425)
+# ou mot-clé, les plus longs d'abord ("football" avant "foot", "第三套" avant "第三")
+_QUERY_RE = re.compile(
+    r"(?<![0-9])(?P<year>20\d{2})(?:[/-]?(?:20)?(?P<next>\d{2}))?(?![0-9])"
+    + r"|(?P<kw>"
+    + "|".join(
+        _keyword_pattern(kw)
+        for kw in sorted({*_QUERY_TYPES, *_QUERY_VERSIONS, *_QUERY_FILLERS}, key=len, reverse=True)
+    )
+    + ")"
+)
+
+
+@lru_cache(maxsize=4096)
+def _parse_query(q: str) -> tuple:
+    q_lower = q.lower().strip()
+    detected_type = detected_version = detected_season = None
+    parts, last = [], 0
+    for m in _QUERY_RE.finditer(q_lower):
+        kw = m.group("kw")
+        if kw is None:
+            # Première saison seulement, normalisée en "AAAA-AA"
+            if detected_season:
+                continue
+            year, following = m.group("year", "next")
+            detected_season = f"{year}-{following}" if following else year
+        elif kw in _QUERY_TYPES:
+            detected_type = detected_type or _QUERY_TYPES[kw]
+        elif kw in _QUERY_VERSIONS:
+            detected_version = detected_version or kw
+        parts.append(q_lower[last:m.start()])
+        last = m.end()
+    parts.append(q_lower[last:])
+    team_query = " ".join(" ".join(parts).split())
+    return team_query, detected_type, detected_version, detected_season
+
+
 def parse_query(q: str) -> dict:
     """
     Analyse une requête utilisateur et en extrait les composantes.
     Ex: "maillot extérieur real madrid 2024" → {team, type, season, raw}
+    Les mots-clés ne sont reconnus que comme mots entiers ("homeland" ne vaut pas
+    "home") ; le résultat est mémoïsé (l'autocomplete répète les mêmes préfixes).
     """
-    q_lower = q.lower().strip()
-
-    # Détecter les types de maillot dans la requête
-    type_keywords = {
-        "home": "Home", "domicile": "Home", "主场": "Home",
-        "away": "Away", "extérieur": "Away", "exterieur": "Away", "客场": "Away",
-        "third": "Third", "troisième": "Third",
-        "retro": None,   # filtre version retro
-        "vintage": None,
-    }
-    detected_type    = None
-    detected_version = None
-    for kw, jersey_type in type_keywords.items():
-        if kw in q_lower:
-            if jersey_type:
-                detected_type = jersey_type
-            else:
-                detected_version = kw
-
-    # Détecter une saison
-    import re
-    season_match = re.search(r"\b(20\d{2})[/-]?(\d{0,2})\b", q_lower)
-    detected_season = season_match.group(0).replace("/", "-") if season_match else None
-
-    # Construire la chaîne "équipe nettoyée"
-    team_query = q_lower
-    for kw in list(type_keywords.keys()) + ["maillot", "jersey", "shirt", "kit", "foot", "football", "soccer"]:
-        team_query = team_query.replace(kw, " ")
-    if detected_season:
-        team_query = team_query.replace(detected_season, " ")
-    team_query = " ".join(team_query.split())
-
+    team_query, detected_type, detected_version, detected_season = _parse_query(q)
     return {
         "raw":     q,
         "team":    team_query,
@@ -184,32 +1257,125 @@ def parse_query(q: str) -> dict:
     }
 
 
-def resolve_team_query(team_query: str) -> Optional[str]:
+# ── Fautes de frappe : voisinage par suppressions (SymSpell) ─────────────────
+
+TYPO_MAX_DISTANCE = 2
+
+
+def _typo_budget(length: int) -> int:
+    """
+    Distance d'édition tolérée selon la longueur (la plus grande de la requête et
+    de l'alias), plafonnée à TYPO_MAX_DISTANCE : 0 sous 5 caractères ("roma"/"rome"),
+    1 jusqu'à 8, 2 à partir de 9.
+    """
+    return 0 if length < 5 else 1 if length < 9 else TYPO_MAX_DISTANCE
+
+
+def _deletions(word: str, depth: int) -> set[str]:
+    """word et toutes ses variantes privées de 1 à depth caractères."""
+    found, frontier = {word}, (word,)
+    for _ in range(depth):
+        variants = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants -= found
+        found |= variants
+        frontier = variants
+    return found
+
+
+class _TypoIndex:
+    """
+    Dictionnaire des suppressions (SymSpell) sur les alias normalisés (latins) :
+    une requête à distance d'édition <= 2 d'un alias partage avec lui une variante
+    obtenue par suppressions. Les candidats sont trouvés par lookups de hash puis
+    vérifiés par une vraie distance (OSA : une inversion "cl"/"lc" compte pour 1),
+    sans parcourir tous les alias.
+    """
+
+    def __init__(self, alias_norms: list[str], team_keys: list[str]):
+        self.alias_norms = alias_norms
+        self.team_keys   = team_keys
+        deletes: dict[str, list[int]] = defaultdict(list)
+        for i, alias_norm in enumerate(alias_norms):
+            # Profondeur suffisante pour une requête plus longue (jusqu'à TYPO_MAX_DISTANCE)
+            for variant in _deletions(alias_norm, _typo_budget(len(alias_norm) + TYPO_MAX_DISTANCE)):
+                deletes[variant].append(i)
+        self.deletes = dict(deletes)
+
+    def candidates(self, q_norm: str) -> tuple:
+        """
+        Alias à distance tolérée de q_norm, dans l'ordre de l'index :
+        (distance, distance Indel, -longueur, team_key).
+        """
+        from rapidfuzz.distance import OSA, Indel
+
+        depth = _typo_budget(len(q_norm) + TYPO_MAX_DISTANCE)
+        if not depth:
+            return ()
+        found = set()
+        for variant in _deletions(q_norm, depth):
+            found.update(self.deletes.get(variant, ()))
+
+        matches = []
+        for i in sorted(found):
+            alias_norm = self.alias_norms[i]
+            limit = _typo_budget(max(len(q_norm), len(alias_norm)))
+            distance = OSA.distance(q_norm, alias_norm, score_cutoff=limit)
+            if distance <= limit:
+                indel = Indel.distance(q_norm, alias_norm)
+                matches.append((distance, indel, -len(alias_norm), self.team_keys[i]))
+        return tuple(matches)
+
+
+@lru_cache(maxsize=1)
+def _typo_index() -> _TypoIndex:
+    """Construit au premier chargement d'index (les alias ne changent qu'avec le code)."""
+    teams = team_index()
+    norms, keys = {}, []
+    for alias, alias_norm in zip(teams.aliases, teams.alias_norms):
+        # Alias latins seulement ; premier alias de chaque forme normalisée
+        if alias_norm.isascii() and alias_norm not in norms:
+            norms[alias_norm] = len(keys)
+            keys.append(teams.alias_index[alias])
+    return _TypoIndex(list(norms), keys)
+
+
+@lru_cache(maxsize=4096)
+def _typo_candidates(q_norm: str) -> tuple:
+    """Candidats mémoïsés : les alias ne changent pas d'un rechargement à l'autre."""
+    return _typo_index().candidates(q_norm)
+
+
+def resolve_team_query(team_query: str, team_counts: Optional[dict] = None) -> Optional[str]:
     """
     Résout une requête en clé d'équipe.
-    Ordre : exact alias → fuzzy alias
+    Ordre : exact alias → alias contenu → faute de frappe (SymSpell) → fuzzy alias
+    Fautes de frappe tolérées selon la longueur (_typo_budget, la plus grande de la
+    requête et de l'alias) : aucune sous 5 caractères, distance 1 jusqu'à 8, 2 au-delà.
+    team_counts : nombre de produits par team_key (départage des fautes de frappe).
     Retourne la team_key ou None.
     """
     if not team_query or len(team_query) < 2:
         return None
 
+    teams = team_index()
+
     # 1. Exact match
     q_lower = team_query.lower().strip()
-    if q_lower in _ALIAS_INDEX:
-        return _ALIAS_INDEX[q_lower]
+    if q_lower in teams.alias_index:
+        return teams.alias_index[q_lower]
 
     # 2. Chercher si la requête contient un alias connu
     q_norm = normalize_text(q_lower)
     best_key   = None
     best_score = 0
 
-    for alias, team_key in _ALIAS_INDEX.items():
+    for alias, alias_norm in zip(teams.aliases, teams.alias_norms):
         # Autoriser alias CJK de 2 chars (ex: 皇马, 巴西) ; ignorer Latin < 3 chars
         if len(alias) < 2:
             continue
         if len(alias) == 2 and all(ord(c) < 0x4E00 for c in alias):
             continue
-        alias_norm = normalize_text(alias)
+        team_key = teams.alias_index[alias]
         # L'alias est-il contenu dans la requête ? (ou inversement ?)
         if alias_norm in q_norm or q_norm in alias_norm:
             score = len(alias_norm)
@@ -220,21 +1386,91 @@ def resolve_team_query(team_query: str) -> Optional[str]:
     if best_key:
         return best_key
 
-    # 3. Fuzzy match (seuil 85 pour éviter les faux positifs)
-    result = process.extractOne(
-        q_norm,
-        list(_ALIAS_INDEX.keys()),
-        scorer=fuzz.token_set_ratio,
-        score_cutoff=85,
-    )
+    # 3. Faute de frappe (distance <= _typo_budget) : lookups de hash, avant le fuzzy
+    typo_matches = _typo_candidates(q_norm)
+    if typo_matches:
+        # Départage à distance égale : distance Indel (celle du fuzzy : une lettre en trop
+        # plutôt qu'une lettre changée, "leens" → lens), alias le plus long, puis équipe
+        # ayant le plus de produits
+        counts = team_counts or {}
+        return min(typo_matches, key=lambda m: (*m[:3], -counts.get(m[3], 0)))[3]
+
+    # 4. Fuzzy match sur les alias présélectionnés (seuil 85 pour éviter les faux positifs)
+    result = match_alias_fuzzy(q_norm, FUZZY_THRESHOLD_QUERY)
     if result:
-        matched_alias, score, _ = result
-        return _ALIAS_INDEX[matched_alias]
+        return result[0]
 
     return None
 
 
-def search_products(
+def _encode_cursor(generation: int, sort_key: tuple, product_id: str) -> str:
+    """Curseur opaque : génération de l'index + clé de tri du dernier produit servi."""
+    raw = json.dumps([generation, list(sort_key), product_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[int, tuple, str]:
+    """Inverse de _encode_cursor. Lève ValueError si le curseur est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        generation, sort_key, product_id = json.loads(raw)
+        return int(generation), tuple(int(v) for v in sort_key), str(product_id)
+    except Exception as e:
+        raise ValueError(f"Curseur invalide : {cursor!r}") from e
+
+
+def _canonical_type(jersey_type: Optional[str]) -> Optional[str]:
+    """Type de maillot du filtre ?type= sous sa forme canonique (home → Home)."""
+    if not jersey_type:
+        return None
+    type_map = {"home": "Home", "away": "Away", "third": "Third"}
+    return type_map.get(jersey_type.lower(), jersey_type.capitalize())
+
+
+def _shared(shared: Optional[dict], key: tuple, compute):
+    """compute(), calculé une seule fois par lot si un mémo shared est fourni."""
+    if shared is None:
+        return compute()
+    if key not in shared:
+        shared[key] = compute()
+    return shared[key]
+
+
+def _top_k(ids, k: int, key) -> list[int]:
+    """Les k premiers ordinaux selon key : sélection par tas plutôt que tri complet."""
+    if k >= len(ids):
+        return sorted(ids, key=key)
+    return heapq.nsmallest(k, ids, key=key)
+
+
+def _top_k_ordered(ids, k: int, order, key, after: Optional[tuple] = None) -> list[int]:
+    """
+    Les k premiers ordinaux de ids (après la clé after) dans l'ordre précalculé
+    order, trié selon key. Parcours de la permutation en fusion avec ids quand ils
+    sont assez denses pour que les k premiers arrivent vite ; sinon tas sur ids.
+    """
+    if len(ids) * len(ids) < k * len(order):
+        candidates = ids if after is None else [i for i in ids if key(i) > after]
+        return _top_k(candidates, k, key)
+
+    # Reprise après un curseur : dichotomie sur la permutation
+    lo, hi = 0, len(order)
+    while after is not None and lo < hi:
+        mid = (lo + hi) // 2
+        if key(order[mid]) <= after:
+            lo = mid + 1
+        else:
+            hi = mid
+    top = []
+    for i in order[lo:]:
+        if i in ids:
+            top.append(i)
+            if len(top) == k:
+                break
+    return top
+
+
+def _search_ids(
     q: str,
     version: Optional[str] = None,
     country: Optional[str] = None,
@@ -243,112 +1479,216 @@ def search_products(
     jersey_type: Optional[str] = None,
     page: int = 1,
     per_page: int = 60,
+    snapshot: Optional[SearchIndex] = None,
+    cursor: Optional[str] = None,
+    shared: Optional[dict] = None,
+    sort: Optional[str] = None,
 ) -> dict:
     """
-    Recherche principale.
+    Recherche principale, sur les ordinaux : "ids" contient ceux de la page
+    (les produits ne sont matérialisés qu'au rendu de la réponse).
     Priorité : exact team name > alias > fuzzy > tags > full-text
     JAMAIS de tri par couleur par défaut.
+    snapshot : index à interroger (par défaut l'index global courant).
+    cursor   : next_cursor d'une réponse précédente (« charger plus ») ; remplace page.
+    shared   : mémo commun aux recherches d'un lot sur le même snapshot (postings
+               intersectés, équipes résolues, scores full-text), voir _shared.
+    sort     : tri de SORT_KEYS (None = pertinence) ; les tris précalculés sont
+               parcourus en fusion avec les filtres plutôt que triés à chaque requête.
     """
-    if not index.loaded:
-        return {"results": [], "total": 0, "page": page, "query": q}
-
-    results = index.products[:]  # copie
-
-    # ── Filtres stricts (non-textuels) ────────────────────────────────────────
-    if version:
-        results = [p for p in results if p.get("version") == version]
-    if country:
-        c = country.lower()
-        results = [p for p in results if c in (p.get("country") or "").lower()]
-    if league:
-        lg = league.lower()
-        results = [p for p in results if lg in (p.get("league") or "").lower()]
-    if season:
-        results = [p for p in results if season in (p.get("season") or "")]
-    if jersey_type:
-        jt = jersey_type.lower()
-        type_map = {"home": "Home", "away": "Away", "third": "Third"}
-        jersey_type_canonical = type_map.get(jt, jersey_type.capitalize())
-        results = [p for p in results if p.get("type") == jersey_type_canonical]
+    idx = snapshot or index
+    if not idx.loaded:
+        return {"ids": [], "total": 0, "page": page, "query": q}
+
+    def select(*filters):
+        return _shared(shared, ("select", filters), lambda: idx.select(*filters))
+
+    # ── Filtres stricts (non-textuels) : intersection de postings ─────────────
+    ids = select(version, country, league, season, _canonical_type(jersey_type))
+
+    # Clé de tri par ordinal (croissante) ; départage toujours par ordre du catalogue
+    sort_key = lambda i: (i,)
+    order    = None   # permutation précalculée cohérente avec sort_key, si elle existe
 
     # ── Recherche textuelle ───────────────────────────────────────────────────
     if q and q.strip():
         parsed    = parse_query(q)
-        team_key  = resolve_team_query(parsed["team"])
+        team_key  = _shared(shared, ("team", parsed["team"]),
+                            lambda: resolve_team_query(parsed["team"], idx.team_counts))
 
-        # Appliquer les filtres détectés dans la requête
-        if parsed["type"]:
-            results = [p for p in results if p.get("type") == parsed["type"]]
-        if parsed["season"]:
-            results = [p for p in results if parsed["season"] in (p.get("season") or "")]
+        # Appliquer les filtres détectés dans la requête (+ l'équipe résolue)
+        detected = select(None, None, None, parsed["season"], parsed["type"], team_key)
+        if detected is not None:
+            ids = detected if ids is None else ids & detected
 
         if team_key:
-            # Match sur la clé d'équipe — tri par pertinence
-            def score_product(p: dict) -> int:
-                s = 0
-                if p.get("team_key") == team_key:
-                    s += 100
-                # Booster les matchs haute confiance
-                s += int(p.get("confidence_score", 0) * 20)
-                # Booster par saison récente
-                try:
-                    yr = int((p.get("season") or "0")[:4])
-                    s += max(0, yr - 2010)
-                except ValueError:
-                    pass
-                return s
-
-            results = [p for p in results if p.get("team_key") == team_key]
-            results.sort(key=score_product, reverse=True)
+            # Match sur la clé d'équipe — tri par pertinence (confiance, saison récente)
+            boost    = idx.boost
+            sort_key = lambda i: (-(TEAM_MATCH_SCORE + boost[i]), i)
+            order    = idx.orders["relevance"]
 
         else:
             # Pas d'équipe trouvée : fallback sur full-text (tags, raw_title)
-            q_tokens = set(normalize_text(q).split())
+            q_tokens = frozenset(normalize_text(q).split())
             if q_tokens:
-                def text_score(p: dict) -> int:
-                    s = 0
-                    tags     = [normalize_text(t) for t in (p.get("tags") or [])]
-                    raw      = normalize_text(p.get("raw_title") or "")
-                    team_low = normalize_text(p.get("team") or "")
-
-                    for token in q_tokens:
-                        if len(token) < 2:
-                            continue
-                        if token in team_low:
-                            s += 50
-                        if any(token == tag for tag in tags):
-                            s += 30
-                        if any(token in tag for tag in tags):
-                            s += 15
-                        if token in raw:
-                            s += 10
-                    return s
-
-                scored  = [(p, text_score(p)) for p in results]
-                scored  = [(p, s) for p, s in scored if s > 0]
-                scored.sort(key=lambda x: x[1], reverse=True)
-                results = [p for p, _ in scored]
-
-    # ── Pagination ────────────────────────────────────────────────────────────
-    total      = len(results)
-    start      = (page - 1) * per_page
-    end        = start + per_page
-    page_items = results[start:end]
+                scores = _shared(shared, ("text", q_tokens), lambda: idx.text_scores(q_tokens))
+                if ids is not None:
+                    scores = {i: sc for i, sc in scores.items() if i in ids}
+                # Score décroissant, puis ordre du catalogue
+                ids      = scores.keys()
+                sort_key = lambda i: (-scores[i], i)
+
+    if sort and sort != "relevance":
+        keys     = idx.sort_keys[sort]
+        sort_key = lambda i: (keys[i], i)
+        order    = idx.orders[sort]
+
+    if ids is None:
+        ids = range(len(idx))
+
+    # ── Pagination : top-k (tas ou fusion avec un tri précalculé), curseur ────
+    total = len(ids)
+    start = (page - 1) * per_page
+    after = None
+    if cursor:
+        generation, after, last_id = _decode_cursor(cursor)
+        if generation != idx.generation:
+            # Index rechargé depuis : repositionner le dernier produit dans le nouveau catalogue
+            ordinal = idx.ordinals.get(last_id, -1)
+            after   = (*after[:-1], ordinal)
+        start = 0
+
+    if order is not None:
+        top  = _top_k_ordered(ids, start + per_page + 1, order, sort_key, after)
+        more = len(top) > start + per_page
+        top  = top[:start + per_page]
+    else:
+        if after is not None:
+            ids = [i for i in ids if sort_key(i) > after]
+        top  = _top_k(ids, start + per_page, sort_key)
+        more = len(ids) > len(top)
+    page_ids   = top[start:]
+    next_cursor = None
+    if page_ids and more:
+        last = page_ids[-1]
+        next_cursor = _encode_cursor(idx.generation, sort_key(last), idx.product_id(last))
 
     return {
-        "results":    page_items,
+        "ids":        page_ids,
         "total":      total,
         "page":       page,
         "per_page":   per_page,
         "total_pages": (total + per_page - 1) // per_page,
         "query":      q,
+        "next_cursor": next_cursor,
     }
 
 
+def search_products(
+    q: str,
+    version: Optional[str] = None,
+    country: Optional[str] = None,
+    league: Optional[str] = None,
+    season: Optional[str] = None,
+    jersey_type: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 60,
+    snapshot: Optional[SearchIndex] = None,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+) -> dict:
+    """Recherche principale (voir _search_ids), avec les produits complets dans "results"."""
+    idx    = snapshot or index
+    result = idx.search(q, version, country, league, season, jersey_type, page, per_page, cursor=cursor, sort=sort)
+    ids    = result.pop("ids")
+    return {"results": idx.products_for(ids), **result}
+
+
+def _parse_fields(fields: Optional[str], view: Optional[str], idx: SearchIndex) -> Optional[tuple[str, ...]]:
+    """Champs demandés par ?fields=a,b ou ?view=card (None = produit complet)."""
+    if view:
+        if view not in VIEWS:
+            raise HTTPException(400, detail=f"Vue inconnue : {view} (disponibles : {', '.join(VIEWS)})")
+        return VIEWS[view]
+    if not fields:
+        return None
+    names   = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in idx.field_names]
+    if unknown and idx.loaded:
+        raise HTTPException(400, detail=f"Champs inconnus : {', '.join(unknown)}")
+    return names or None
+
+
+def _parse_sort(sort: Optional[str]) -> Optional[str]:
+    """Tri demandé par ?sort= (None = pertinence)."""
+    if not sort or sort == "relevance":
+        return None
+    if sort not in SORT_KEYS:
+        raise HTTPException(400, detail=f"Tri inconnu : {sort} (disponibles : {', '.join(SORT_KEYS)})")
+    return sort
+
+
+def _search_body(result: dict, idx: SearchIndex, fields: Optional[tuple[str, ...]], q: str) -> bytes:
+    """
+    Corps de /api/search, assemblé directement depuis le JSON pré-sérialisé
+    des produits (complet, ou fragments de la projection demandée).
+    """
+    meta = {k: v for k, v in result.items() if k != "ids"}
+    meta["query"] = q
+    items = idx.render_items(result["ids"], fields)
+    return b'{"results":[' + items + b"]," + _dumps_bytes(meta)[1:]
+
+
+def _search_key(q: str, *params) -> tuple:
+    """Clé de search_cache (commune à /api/search et /api/search/batch)."""
+    return (" ".join(q.lower().split()), *params)
+
+
+def _static_response(request: Request, idx: SearchIndex, build) -> Response:
+    """
+    Réponse d'un endpoint qui ne change qu'au rechargement de l'index : ETag
+    de la génération (304 si le client l'a déjà), Cache-Control configurable,
+    corps construit par build() et compressé une seule fois par génération et par URL.
+    """
+    headers = {
+        "ETag":          idx.etag,
+        "Cache-Control": API.get("cache_control", "public, max-age=60"),
+        "Vary":          "Accept-Encoding",
+    }
+    if _etag_matches(request, idx.etag):
+        return Response(status_code=304, headers=headers)
+
+    key    = _static_key(request)
+    bodies = idx.http_bodies.get(key)
+    if bodies is None:
+        bodies = {None: build()}
+        if len(idx.http_bodies) < HTTP_BODIES_MAX:
+            idx.http_bodies[key] = bodies
+
+    encoding = _pick_encoding(request) if len(bodies[None]) >= COMPRESS_MIN_SIZE else None
+    if encoding:
+        if encoding not in bodies:
+            bodies[encoding] = _compress(bodies[None], encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=bodies[encoding], media_type="application/json", headers=headers)
+
+
+def _static_key(request: Request) -> str:
+    return f"{request.url.path}?{request.url.query}"
+
+
+async def _static_response_offloaded(request: Request, idx: SearchIndex, build) -> Response:
+    """_static_response, avec build() et la compression sur le pool CPU s'ils sont à faire."""
+    if _etag_matches(request, idx.etag) or _static_key(request) in idx.http_bodies:
+        return _static_response(request, idx, build)
+    return await cpu_pool.run(_static_response, request, idx, build)
+
+
 # ── Endpoints API ─────────────────────────────────────────────────────────────
 
 @app.get("/api/search")
 async def api_search(
+    request: Request,
     q:       str = Query(default="", description="Requête de recherche"),
     version: Optional[str] = Query(default=None, description="fan|player|retro|kit"),
     country: Optional[str] = Query(default=None),
@@ -357,14 +1697,120 @@ async def api_search(
     type:    Optional[str] = Query(default=None, alias="type"),
     page:    int = Query(default=1, ge=1),
     limit:   int = Query(default=60, ge=1, le=200),
+    cursor:  Optional[str] = Query(default=None, description="next_cursor de la page précédente"),
+    fields:  Optional[str] = Query(default=None, description="Champs à renvoyer, ex: id,team_short,price"),
+    view:    Optional[str] = Query(default=None, description="Projection prédéfinie : card"),
+    sort:    Optional[str] = Query(default=None, description="relevance|newest|price|price_desc|season"),
 ):
     """Recherche principale. Retourne les produits correspondants."""
-    if not q and not version and not country and not league and not season:
-        # Sans requête → retourner les derniers produits
-        products = index.products[:limit]
-        return {"results": products, "total": len(index.products), "page": 1, "query": ""}
-
-    return search_products(q, version, country, league, season, type, page, limit)
+    idx = index   # snapshot : la requête se termine sur cet index même si un rechargement survient
+    projection = _parse_fields(fields, view, idx)
+    sort = _parse_sort(sort)
+    if not q and not version and not country and not league and not season and not cursor:
+        # Sans requête → retourner les derniers produits (ou les premiers du tri demandé) ;
+        # first_ids n'est appelé qu'à la construction du corps (pas pour un 304), sur le pool
+        def build() -> bytes:
+            result = {"ids": idx.first_ids(limit, sort), "total": len(idx), "page": 1}
+            return _search_body(result, idx, projection, "")
+
+        return await _static_response_offloaded(request, idx, build)
+
+    # Requêtes fréquentes (PSG, Real Madrid, retro…) : servies depuis le cache
+    key = _search_key(q, version, country, league, season, type, page, limit, cursor, sort)
+    generation = idx.generation
+    result = search_cache.get(key, generation)
+    if result is not None:
+        return _json_response(_search_body(result, idx, projection, q), request)
+
+    def run() -> Response:
+        # Pool CPU : analyse, résolution (fuzzy), scoring et rendu hors de la boucle asyncio
+        try:
+            result = idx.search(q, version, country, league, season, type, page, limit, cursor=cursor, sort=sort)
+        except ValueError as e:
+            raise HTTPException(400, detail=str(e))
+        search_cache.put(key, generation, result)
+        return _json_response(_search_body(result, idx, projection, q), request)
+
+    return await cpu_pool.run(run)
+
+
+class SearchQuery(BaseModel):
+    """Une recherche d'un lot : mêmes paramètres que GET /api/search."""
+    q:       str = ""
+    version: Optional[str] = None
+    country: Optional[str] = None
+    league:  Optional[str] = None
+    season:  Optional[str] = None
+    type:    Optional[str] = None
+    page:    int = Field(default=1, ge=1)
+    limit:   int = Field(default=60, ge=1, le=200)
+    cursor:  Optional[str] = None
+    fields:  Optional[str] = None
+    view:    Optional[str] = None
+    sort:    Optional[str] = None
+
+
+class SearchBatch(BaseModel):
+    queries: list[SearchQuery]
+
+
+def _search_batch(idx: SearchIndex, queries: list[SearchQuery]) -> bytes:
+    """
+    Corps de /api/search/batch : chaque recherche est évaluée sur le même snapshot,
+    avec un mémo commun (filtres, équipes résolues, scores full-text) ; les
+    recherches identiques du lot ne sont calculées qu'une fois.
+    """
+    shared  = {}
+    results = {}   # clé de cache → résultat, pour ce lot
+    bodies  = []
+    for n, item in enumerate(queries):
+        try:
+            projection = _parse_fields(item.fields, item.view, idx)
+            sort       = _parse_sort(item.sort)
+        except HTTPException as e:
+            raise HTTPException(400, detail=f"queries[{n}] : {e.detail}")
+
+        if not item.q and not item.version and not item.country and not item.league \
+                and not item.season and not item.cursor:
+            # Sans requête → les derniers produits, comme GET /api/search (déjà sur le pool CPU)
+            ids    = _shared(shared, ("first", item.limit, sort), lambda: idx.first_ids(item.limit, sort))
+            result = {"ids": ids, "total": len(idx), "page": 1}
+        else:
+            key = _search_key(
+                item.q, item.version, item.country, item.league, item.season,
+                item.type, item.page, item.limit, item.cursor, sort,
+            )
+            result = results.get(key) or search_cache.get(key, idx.generation)
+            if result is None:
+                try:
+                    result = idx.search(
+                        item.q, item.version, item.country, item.league, item.season,
+                        item.type, item.page, item.limit, cursor=item.cursor, shared=shared,
+                        sort=sort,
+                    )
+                except ValueError as e:
+                    raise HTTPException(400, detail=f"queries[{n}] : {e}")
+                search_cache.put(key, idx.generation, result)
+            results[key] = result
+        bodies.append(_search_body(result, idx, projection, item.q))
+    return b'{"searches":[' + b",".join(bodies) + b"]}"
+
+
+@app.post("/api/search/batch")
+async def api_search_batch(request: Request, batch: SearchBatch):
+    """
+    Plusieurs recherches en un aller-retour (rangées d'équipes et de ligues d'une
+    page) : "searches" contient, dans l'ordre, la réponse de GET /api/search de chacune.
+    """
+    limit = API.get("search_batch_max", 20)
+    if len(batch.queries) > limit:
+        raise HTTPException(400, detail=f"Trop de recherches : {len(batch.queries)} (max {limit})")
+    idx = index   # snapshot commun à tout le lot
+
+    # Un seul passage par le pool CPU pour tout le lot
+    return await cpu_pool.run(
+        lambda: _json_response(_search_batch(idx, batch.queries), request),
+    )
 
 
 @app.get("/api/suggest")
@@ -375,130 +1821,61 @@ async def api_suggest(
     Autocomplete : retourne des suggestions d'équipes, ligues, saisons.
     Répond en < 50ms grâce à l'index en mémoire.
     """
-    q_norm = normalize_text(q)
-    suggestions = []
-    seen = set()
-
-    # 1. Équipes dont le nom ou alias commence par la requête
-    for alias, team_key in _ALIAS_INDEX.items():
-        if normalize_text(alias).startswith(q_norm) and team_key not in seen:
-            team_data = TEAM_DATABASE.get(team_key, {})
-            seen.add(team_key)
-            suggestions.append({
-                "type":    "team",
-                "label":   team_data.get("canonical_name", team_key),
-                "short":   team_data.get("short_name", ""),
-                "league":  team_data.get("league", ""),
-                "country": team_data.get("country", ""),
-            })
-
-    # 2. Équipes disponibles dans la base (contient q)
-    for p in index.products:
-        team_short = p.get("team_short", "")
-        team_key   = p.get("team_key", "")
-        if (
-            team_key
-            and team_key not in seen
-            and q_norm in normalize_text(team_short)
-        ):
-            seen.add(team_key)
-            suggestions.append({
-                "type":    "team",
-                "label":   p.get("team", team_short),
-                "short":   team_short,
-                "league":  p.get("league", ""),
-                "country": p.get("country", ""),
-            })
-
-    # 3. Ligues
-    for league in index.leagues:
-        if q_norm in normalize_text(league) and league not in seen:
-            seen.add(league)
-            suggestions.append({"type": "league", "label": league})
-
-    # 4. Pays
-    for country in index.countries:
-        if q_norm in normalize_text(country) and country not in seen:
-            seen.add(country)
-            suggestions.append({"type": "country", "label": country})
-
-    # Limiter à 10 suggestions, équipes en priorité
-    suggestions.sort(key=lambda x: (0 if x["type"] == "team" else 1, x["label"]))
-    return {"suggestions": suggestions[:10], "query": q}
+    # Trie précalculé : top 10 (équipes d'abord, puis ordre alphabétique).
+    # O(longueur du préfixe) : exécuté directement, le pool CPU coûterait plus cher
+    return {"suggestions": index.suggest.lookup(normalize_text(q)), "query": q}
 
 
 @app.get("/api/teams")
 async def api_teams(
+    request: Request,
     league:  Optional[str] = Query(default=None),
     country: Optional[str] = Query(default=None),
 ):
     """Liste toutes les équipes disponibles dans la base."""
-    teams = []
-    seen  = set()
+    idx = index
 
-    for p in index.products:
-        if not p.get("matched") or not p.get("team_key"):
-            continue
-        key = p["team_key"]
-        if key in seen:
-            continue
-        if league  and league.lower()  not in (p.get("league", "")  or "").lower():
-            continue
-        if country and country.lower() not in (p.get("country", "") or "").lower():
-            continue
-        seen.add(key)
-        teams.append({
-            "key":      key,
-            "name":     p["team"],
-            "short":    p.get("team_short", ""),
-            "league":   p.get("league", ""),
-            "country":  p.get("country", ""),
-            "count":    sum(1 for x in index.products if x.get("team_key") == key),
-        })
+    def build() -> bytes:
+        teams = idx.team_records
+        if league:
+            lg = league.lower()
+            teams = [t for t in teams if lg in (t["league"] or "").lower()]
+        if country:
+            c = country.lower()
+            teams = [t for t in teams if c in (t["country"] or "").lower()]
+        return _dumps_bytes({"teams": teams, "total": len(teams)})
 
-    teams.sort(key=lambda t: t["name"])
-    return {"teams": teams, "total": len(teams)}
+    return await _static_response_offloaded(request, idx, build)
 
 
 @app.get("/api/filters")
-async def api_filters():
+async def api_filters(request: Request):
     """Retourne toutes les options de filtres disponibles."""
-    return {
-        "versions":  [{"value": v, "label": _version_label(v)} for v in index.versions],
-        "leagues":   sorted(index.leagues),
-        "countries": sorted(index.countries),
-        "seasons":   sorted(index.seasons, reverse=True),
+    idx = index
+    return _static_response(request, idx, lambda: _dumps_bytes({
+        "versions":  [{"value": v, "label": _version_label(v)} for v in idx.versions],
+        "leagues":   sorted(idx.leagues),
+        "countries": sorted(idx.countries),
+        "seasons":   sorted(idx.seasons, reverse=True),
         "types":     ["Home", "Away", "Third", "Goalkeeper", "Training", "Special"],
-    }
+    }))
 
 
 @app.get("/api/product/{product_id}")
-async def api_product(product_id: str):
+async def api_product(request: Request, product_id: str):
     """Retourne les détails d'un produit spécifique."""
-    product = index.by_id.get(product_id)
-    if not product:
+    idx = index
+    doc = idx.product_doc(product_id)
+    if doc is None:
         raise HTTPException(404, detail="Produit non trouvé")
-    return product
+    return _static_response(request, idx, lambda: doc)
 
 
 @app.get("/api/stats")
-async def api_stats():
+async def api_stats(request: Request):
     """Statistiques de la base de données."""
-    total   = len(index.products)
-    matched = sum(1 for p in index.products if p.get("matched"))
-
-    version_counts = Counter(p.get("version", "?") for p in index.products)
-    league_counts  = Counter(p.get("league", "?") for p in index.products if p.get("matched"))
-
-    return {
-        "total_products":  total,
-        "matched":         matched,
-        "unmatched":       total - matched,
-        "match_rate":      round(matched / total * 100, 1) if total else 0,
-        "by_version":      dict(version_counts.most_common()),
-        "top_leagues":     dict(league_counts.most_common(10)),
-        "total_teams":     len(index.teams),
-    }
+    idx = index
+    return _static_response(request, idx, lambda: _dumps_bytes(idx.stats))
 
 
 def _version_label(v: str) -> str:
@@ -527,17 +1904,16 @@ def check_admin(credentials: HTTPBasicCredentials = Depends(security)):
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_page(username: str = Depends(check_admin)):
     """Page d'administration EliteKits."""
-    stats  = await api_stats()
-    return HTMLResponse(_render_admin_html(stats))
+    return HTMLResponse(_render_admin_html(index.stats))
 
 
 @app.get("/admin/unmatched")
 async def admin_unmatched(username: str = Depends(check_admin)):
     """Liste les produits non-matchés."""
-    unmatched = [p for p in index.products if not p.get("matched")]
+    unmatched, total = index.unmatched(200)
     return {
-        "unmatched": unmatched[:200],
-        "total": len(unmatched),
+        "unmatched": unmatched,
+        "total": total,
     }
 
 
@@ -548,15 +1924,15 @@ async def admin_fix_team(
     username:   str = Depends(check_admin),
 ):
     """Corrige manuellement l'équipe associée à un produit."""
+    import asyncio
     from team_extractor import TEAM_DATABASE
-    if product_id not in index.by_id:
+    if index.product_doc(product_id) is None:
         raise HTTPException(404, "Produit non trouvé")
     if team_key not in TEAM_DATABASE:
         raise HTTPException(400, f"Équipe inconnue : {team_key}")
 
-    product   = index.by_id[product_id]
     team_data = TEAM_DATABASE[team_key]
-    product.update({
+    fix = {
         "team":             team_data["canonical_name"],
         "team_short":       team_data["short_name"],
         "team_key":         team_key,
@@ -565,13 +1941,44 @@ async def admin_fix_team(
         "country":          team_data.get("country", ""),
         "confidence_score": 1.0,
         "matched":          True,
-    })
+    }
 
-    # Sauvegarder les changements
-    _save_products()
+    # Sauvegarder puis échanger un index reconstruit (l'index courant n'est pas modifié)
+    await asyncio.to_thread(_apply_product_fix, product_id, fix)
     return {"status": "ok", "product_id": product_id, "team": team_data["canonical_name"]}
 
 
+def _apply_product_fix(product_id: str, fix: dict):
+    """Applique une correction à une copie du catalogue, la sauvegarde et l'indexe."""
+    with _reload_lock:
+        current = index
+        if isinstance(current, SearchIndex):
+            catalog = list(current.products)
+        else:
+            catalog = json.loads(PRODUCTS_JSON.read_text(encoding="utf-8"))
+        products = [
+            {**p, **fix} if p["id"] == product_id else p
+            for p in catalog
+        ]
+        _save_products(products)
+
+        if isinstance(current, SearchIndex) and current.image_path is not None:
+            write_catalog_image(products, CATALOG_IMAGE)
+            new = SearchIndex()
+            new.load_image(CATALOG_IMAGE)
+        elif isinstance(current, SearchIndex):
+            new = SearchIndex()
+            new.products     = products
+            new.source_stamp = _catalog_stamp()   # notre propre écriture : pas de rechargement
+            new.reindex()
+        else:
+            from database_builder import _save_to_sqlite
+            _save_to_sqlite(products, PRODUCTS_DB)
+            new = SqliteIndex()
+            new.load(PRODUCTS_DB)
+        swap_index(new)
+
+
 @app.post("/admin/rescrape")
 async def admin_rescrape(
     catalog_id: Optional[str] = None,
@@ -600,18 +2007,20 @@ async def admin_rescrape(
         return {"status": "error", "message": str(e)}
 
     if success:
-        index.reload()
-        return {"status": "ok", "products": len(index.products)}
+        new = await asyncio.to_thread(reload_index)
+        return {"status": "ok", "products": len(new)}
     else:
         return {"status": "error", "stderr": stderr.decode("utf-8", errors="replace")[:2000]}
 
 
-def _save_products():
-    """Sauvegarde les modifications en mémoire dans products.json."""
-    PRODUCTS_JSON.write_text(
-        json.dumps(index.products, ensure_ascii=False, indent=2),
+def _save_products(products: list[dict]):
+    """Sauvegarde le catalogue dans products.json (écriture atomique)."""
+    tmp = PRODUCTS_JSON.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(
+        json.dumps(products, ensure_ascii=False, indent=2),
         encoding="utf-8",
     )
+    os.replace(tmp, PRODUCTS_JSON)
 
 
 def _render_admin_html(stats: dict) -> str:
@@ -754,7 +2163,15 @@ function showToast(msg) {{
 # ── Health check ──────────────────────────────────────────────────────────────
 @app.get("/health")
 async def health():
-    return {"status": "ok", "products": len(index.products), "loaded": index.loaded}
+    idx = index
+    return {
+        "status":       "ok",
+        "products":     len(idx),
+        "loaded":       idx.loaded,
+        "generation":   idx.generation,
+        "search_cache": search_cache.stats(),
+        "cpu_pool":     cpu_pool.stats(),
+    }
 
 
 @app.get("/")
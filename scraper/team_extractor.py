@@ -6,13 +6,18 @@ Usage :
     info = extract_product_info("24-25 巴黎圣日耳曼 主场", "fan")
     # → {"team": "Paris Saint-Germain", "season": "2024-25", "type": "Home", ...}
 """
+import os
+import pickle
 import re
+import sys
 import logging
+import heapq
+import threading
+from collections import Counter, defaultdict, deque
+from itertools import chain
 from pathlib import Path
 from typing import Optional
 
-from rapidfuzz import fuzz, process
-
 log = logging.getLogger("team_extractor")
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1221,18 +1226,30 @@ TEAM_DATABASE = {
 # INDEX DE RECHERCHE (construit au chargement du module)
 # ══════════════════════════════════════════════════════════════════════════════
 
-# Construire un index plat : alias_lower → clé du TEAM_DATABASE
-_ALIAS_INDEX: dict[str, str] = {}
+# Les tables dérivées de TEAM_DATABASE (alias, alias normalisés, automates,
+# index n-grammes) sont compilées dans data/team_index.pickle et chargées au
+# premier usage : voir team_index() plus bas.
+
+
+def _build_alias_index() -> dict[str, str]:
+    """Index plat : alias_lower → clé du TEAM_DATABASE."""
+    alias_index: dict[str, str] = {}
+    for key, data in TEAM_DATABASE.items():
+        for alias in data.get("aliases", []):
+            alias_index[alias.lower()] = key
+        alias_index[key.lower()] = key
+        alias_index[data["canonical_name"].lower()] = key
+        alias_index[data["short_name"].lower()] = key
+    return alias_index
 
-for _key, _data in TEAM_DATABASE.items():
-    for _alias in _data.get("aliases", []):
-        _ALIAS_INDEX[_alias.lower()] = _key
-    _ALIAS_INDEX[_key.lower()] = _key
-    _ALIAS_INDEX[_data["canonical_name"].lower()] = _key
-    _ALIAS_INDEX[_data["short_name"].lower()] = _key
 
-# Liste de tous les alias pour le fuzzy matching
-_ALL_ALIASES = list(_ALIAS_INDEX.keys())
+def __getattr__(name: str):
+    # Compatibilité : _ALIAS_INDEX / _ALL_ALIASES étaient construits à l'import
+    if name == "_ALIAS_INDEX":
+        return team_index().alias_index
+    if name == "_ALL_ALIASES":
+        return team_index().aliases
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1307,14 +1324,8 @@ _SEASON_PATTERNS = [
     r"(?<![0-9])(2[0-9])([0-9]{2})(?![0-9])",
 ]
 
-# Patterns de manches longues
-_LONG_SLEEVE_PATTERNS = [
-    r"\blong\s*sleeve\b",
-    r"\bml\b",
-    r"\bmanches?\s*longues?\b",
-    r"\blong\b.*\bsleeve\b",
-    r"长袖",
-]
+# Mots génériques retirés du titre pour isoler le nom d'équipe
+_GENERIC_WORDS = ["jersey", "shirt", "kit", "maillot", "version", "fan", "player", "retro", "long", "sleeve", "ml"]
 
 
 def normalize_text(s: str) -> str:
@@ -1338,60 +1349,385 @@ def normalize_text(s: str) -> str:
     return s
 
 
-def extract_season(title: str) -> Optional[str]:
-    """Extrait la saison depuis un titre. Ex: '24-25 PSG' → '2024-25'"""
-    for pattern in _SEASON_PATTERNS:
-        m = re.search(pattern, title)
-        if not m:
+# ── Automate Aho-Corasick (alias d'équipes, mots-clés de type) ────────────────
+
+def _is_matchable_alias(alias: str) -> bool:
+    """
+    Autorise les alias CJK de 2 chars (ex: 皇马, 巴西) ; filtre les alias < 2 chars
+    et les alias Latin de 2 chars (trop courts, risque de faux positifs).
+    """
+    if len(alias) < 2:
+        return False
+    if len(alias) == 2 and all(ord(c) < 0x4E00 for c in alias):
+        return False
+    return True
+
+
+class _KeywordAutomaton:
+    """
+    Automate Aho-Corasick compilé une seule fois sur une liste de mots-clés.
+    Une passe sur le texte suffit pour trouver le mot-clé prioritaire qu'il contient,
+    quel que soit le nombre de mots-clés.
+    """
+
+    def __init__(self, patterns: list[tuple[str, str]] = ()):
+        """
+        patterns : liste de (mot_clé, valeur) par ordre de priorité décroissante
+        (le premier mot-clé trouvé dans cet ordre l'emporte).
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Meilleur match (rang, valeur) se terminant sur chaque état
+        self._best: list[Optional[tuple[int, str]]] = [None]
+
+        for rank, (pattern, value) in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                state = nxt
+            if self._best[state] is None:
+                self._best[state] = (rank, value)
+
+        # Liens d'échec (parcours en largeur) + propagation du meilleur match
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fail = self._goto[f].get(ch, 0) if state else 0
+                self._fail[nxt] = fail
+                inherited = self._best[fail]
+                if inherited is not None and (
+                    self._best[nxt] is None or inherited[0] < self._best[nxt][0]
+                ):
+                    self._best[nxt] = inherited
+
+    def tables(self) -> tuple:
+        """Tables de transition (types natifs uniquement, pour la sérialisation)."""
+        return (self._goto, self._fail, self._best)
+
+    @classmethod
+    def from_tables(cls, tables: tuple) -> "_KeywordAutomaton":
+        automaton = cls.__new__(cls)
+        automaton._goto, automaton._fail, automaton._best = tables
+        return automaton
+
+    def search(self, text: str) -> Optional[str]:
+        """Retourne la valeur du mot-clé prioritaire contenu dans text, ou None."""
+        goto, fail, best = self._goto, self._fail, self._best
+        state = 0
+        found = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = best[state]
+            if match is not None and (found is None or match[0] < found[0]):
+                found = match
+        return found[1] if found else None
+
+
+# ── Présélection n-grammes pour le fuzzy matching ────────────────────────────
+
+# Seuils rapidfuzz (sur 100) : titres Yupoo / requêtes de recherche
+FUZZY_THRESHOLD_TITLE = 75
+FUZZY_THRESHOLD_QUERY = 85
+# Longueur maximale (texte normalisé) pour le repli sur tous les alias : au-delà, le
+# texte partage assez de bigrammes avec son alias pour que la présélection le retienne
+FUZZY_FULL_SCAN_MAX_LEN = 4
+
+
+class _NgramBlocker:
+    """
+    Index de bigrammes de caractères sur les alias normalisés.
+    Présélectionne quelques dizaines d'alias partageant le plus de bigrammes avec
+    le texte, pour ne lancer le scorer rapidfuzz que sur cette liste courte.
+    """
+
+    def __init__(self, aliases: list[str], alias_norms: list[str], limit: int = 30):
+        self.aliases = aliases
+        self.limit   = limit
+        postings: dict[str, list[int]] = defaultdict(list)
+        self._sizes: list[int] = []
+        for i, alias_norm in enumerate(alias_norms):
+            grams = self._grams(alias_norm)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = dict(postings)
+
+    def tables(self) -> tuple:
+        """Postings et tailles (types natifs uniquement, pour la sérialisation)."""
+        return (self._postings, self._sizes, self.limit)
+
+    @classmethod
+    def from_tables(cls, aliases: list[str], tables: tuple) -> "_NgramBlocker":
+        blocker = cls.__new__(cls)
+        blocker.aliases = aliases
+        blocker._postings, blocker._sizes, blocker.limit = tables
+        return blocker
+
+    @staticmethod
+    def _grams(text: str) -> set[str]:
+        padded = f" {text} "
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+    def shortlist(self, text_norm: str) -> list[str]:
+        """Alias candidats pour text_norm, dans l'ordre de l'index (départage identique à extractOne)."""
+        grams = self._grams(text_norm)
+        shared = Counter(chain.from_iterable(
+            self._postings[g] for g in grams if g in self._postings
+        ))
+        # Recouvrement dans les deux sens : token_set_ratio favorise les inclusions
+        n_text = len(grams)
+        best = heapq.nlargest(
+            self.limit, shared,
+            key=lambda i: shared[i] / min(self._sizes[i], n_text),
+        )
+        return [self.aliases[i] for i in sorted(best)]
+
+
+# ── Index des équipes compilé (chargement paresseux) ──────────────────────────
+
+_TEAM_INDEX_FILE    = Path(__file__).parent / "data" / "team_index.pickle"
+_TEAM_INDEX_FORMAT  = 1
+_team_index: Optional["_TeamIndex"] = None
+_team_index_lock    = threading.Lock()
+
+
+class _TeamIndex:
+    """Tables dérivées de TEAM_DATABASE et TYPE_MAPPING, prêtes à l'emploi."""
+
+    def __init__(self, alias_index: dict[str, str], alias_norms: list[str], tables: dict):
+        self.alias_index = alias_index
+        # Alias (minuscules) et leur forme normalisée, dans l'ordre de l'index
+        self.aliases     = list(alias_index)
+        self.alias_norms = alias_norms
+        self.alias_automaton = _KeywordAutomaton.from_tables(tables["alias_automaton"])
+        self.type_automaton  = _KeywordAutomaton.from_tables(tables["type_automaton"])
+        self.blocker = _NgramBlocker.from_tables(self.aliases, tables["blocker"])
+        self._tables = tables
+
+    @classmethod
+    def build(cls) -> "_TeamIndex":
+        alias_index = _build_alias_index()
+        aliases     = list(alias_index)
+        alias_norms = [normalize_text(alias) for alias in aliases]
+        # Alias d'équipes : du plus long au plus court pour éviter les faux positifs
+        by_length = sorted(range(len(aliases)), key=lambda i: len(aliases[i]), reverse=True)
+        tables = {
+            "alias_automaton": _KeywordAutomaton([
+                (alias_norms[i], alias_index[aliases[i]])
+                for i in by_length
+                if _is_matchable_alias(aliases[i])
+            ]).tables(),
+            # Types de maillot : l'ordre de TYPE_MAPPING fait foi (formes longues avant abréviations)
+            "type_automaton": _KeywordAutomaton(list(TYPE_MAPPING.items())).tables(),
+            "blocker": _NgramBlocker(aliases, alias_norms).tables(),
+        }
+        return cls(alias_index, alias_norms, tables)
+
+    def dumps(self, source_stamp: tuple) -> bytes:
+        return pickle.dumps({
+            "stamp":       source_stamp,
+            "alias_index": self.alias_index,
+            "alias_norms": self.alias_norms,
+            "tables":      self._tables,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _source_stamp() -> tuple:
+    """Identifie la version du code source (et donc de TEAM_DATABASE) ayant produit l'artefact."""
+    st = os.stat(__file__)
+    return (_TEAM_INDEX_FORMAT, sys.version_info[:2], st.st_mtime_ns, st.st_size)
+
+
+def _load_team_index(path: Path = _TEAM_INDEX_FILE) -> "_TeamIndex":
+    """Charge l'artefact compilé s'il est à jour, sinon le reconstruit et le réécrit."""
+    stamp = _source_stamp()
+    try:
+        data = pickle.loads(path.read_bytes())
+        if data.get("stamp") == stamp:
+            return _TeamIndex(data["alias_index"], data["alias_norms"], data["tables"])
+        log.info("Index des équipes périmé, reconstruction")
+    except FileNotFoundError:
+        log.info("Index des équipes absent, compilation")
+    except Exception as e:
+        log.warning(f"Index des équipes illisible ({e}), reconstruction")
+
+    index = _TeamIndex.build()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(index.dumps(stamp))
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning(f"Impossible d'écrire {path} ({e}), index gardé en mémoire")
+    return index
+
+
+def team_index() -> _TeamIndex:
+    """Index des équipes, chargé au premier appel puis partagé."""
+    global _team_index
+    if _team_index is None:
+        with _team_index_lock:
+            if _team_index is None:
+                _team_index = _load_team_index()
+    return _team_index
+
+
+# ── Analyse d'un titre en une passe ───────────────────────────────────────────
+
+_SEASON_RES = [re.compile(p) for p in _SEASON_PATTERNS]
+
+# Sur chaque chiffre, des lookaheads testent tous les patterns de saison sans
+# consommer le texte ; les mots de type/génériques et les marqueurs de manches
+# longues sont consommés au passage.
+_TITLE_SCAN_RE = re.compile(
+    r"(?P<digit>"
+    + "".join(f"(?:(?=(?P<s{i}>{p})))?" for i, p in enumerate(_SEASON_PATTERNS))
+    + r"[0-9])"
+    # Manches longues : "long sleeve" / "long … sleeve" et "ml" sont détectés via
+    # les mots consommés ; restent "longsleeve", "manche(s) longue(s)" et 长袖
+    + r"|(?P<sleeve>\blongsleeve\b|\bmanches?\s*longues?\b|长袖)"
+    + r"|(?P<word>\b(?:"
+    + "|".join(re.escape(w) for w in sorted(list(TYPE_MAPPING) + _GENERIC_WORDS, key=len, reverse=True))
+    + r")\b)",
+    re.IGNORECASE,
+)
+
+_SEASON_GROUPS = tuple(_TITLE_SCAN_RE.groupindex[f"s{i}"] for i in range(len(_SEASON_PATTERNS)))
+
+# Patterns de saison retirés du titre nettoyé (dans cet ordre) : XX/YY, 202X, 19XX/YY
+_SEASON_STRIP_ORDER = (0, 1, 2)
+
+
+def _season_from_groups(groups: tuple) -> Optional[str]:
+    """Convertit les groupes d'un pattern de saison en 'AAAA-AA' (None = pattern ignoré)."""
+    if len(groups) == 4:
+        # Pattern XX/YY ou 20XX/YY
+        y1 = groups[1]  # 2 derniers chiffres de l'année 1
+        y2 = groups[3]  # 2 derniers chiffres de l'année 2
+        year1 = int("20" + y1) if len(y1) == 2 else int(y1)
+        year2 = int("20" + y2) if len(y2) == 2 else int(y2)
+        if abs(year2 - year1) <= 1:
+            return f"{year1}-{str(year2)[-2:]}"
+        return None
+    if len(groups) == 1:
+        # Année seule
+        return str(int(groups[0]))
+    g0, g1 = groups
+    # Format compact 2 chiffres chacun : "2627" → 26/27 → 2026-27
+    if len(g0) == 2 and len(g1) == 2:
+        y1 = int("20" + g0)
+        y2 = int("20" + g1)
+        if y2 == y1 + 1:
+            return f"{y1}-{g1}"
+        # Pas consécutif → ignorer ce pattern
+        return None
+    # Rétro XX-YY ou XXXX-YY
+    y1 = int(g0) if len(g0) == 4 else int("19" + g0)
+    y2 = int(g1) if len(g1) == 4 else (
+        int("20" + g1) if int(g1) < 50 else int("19" + g1)
+    )
+    return f"{y1}-{str(y2)[-2:]}"
+
+
+def parse_title(title: str) -> dict:
+    """
+    Analyse un titre Yupoo en une seule passe du scanner compilé.
+    Retourne {"season", "type", "sleeve", "team_span"} où team_span est le titre
+    débarrassé des saisons, mots de type et mots génériques.
+    """
+    # Premier match (position, texte) de chaque pattern de saison
+    season_hits: list[Optional[tuple[int, str]]] = [None] * len(_SEASON_PATTERNS)
+    # Tous les matchs des patterns retirés du titre nettoyé
+    strip_hits: dict[int, list[tuple[int, int]]] = {i: [] for i in _SEASON_STRIP_ORDER}
+    removed: list[tuple[int, int]] = []
+    long_sleeve = False
+    saw_long = False
+
+    for m in _TITLE_SCAN_RE.finditer(title):
+        kind = m.lastgroup
+        if kind == "word":
+            word = m.group("word").lower()
+            removed.append(m.span())
+            if word == "ml" or (word == "sleeve" and saw_long):
+                long_sleeve = True
+            elif word == "long":
+                saw_long = True
+        elif kind == "sleeve":
+            long_sleeve = True
+        else:
+            pos = m.start()
+            for i, hit in enumerate(m.group(*_SEASON_GROUPS)):
+                if hit is None:
+                    continue
+                if season_hits[i] is None:
+                    season_hits[i] = (pos, hit)
+                if i in strip_hits:
+                    strip_hits[i].append((pos, pos + len(hit)))
+
+    # Saison : patterns essayés dans l'ordre, premier match de chacun
+    season = None
+    for i, hit in enumerate(season_hits):
+        if hit is None:
             continue
-        groups = m.groups()
-        if len(groups) == 4:
-            # Pattern XX/YY ou 20XX/YY
-            y1 = groups[1]  # 2 derniers chiffres de l'année 1
-            y2 = groups[3]  # 2 derniers chiffres de l'année 2
-            year1 = int("20" + y1) if len(y1) == 2 else int(y1)
-            year2 = int("20" + y2) if len(y2) == 2 else int(y2)
-            if abs(year2 - year1) <= 1:
-                return f"{year1}-{str(year2)[-2:]}"
-        elif len(groups) == 1:
-            # Année seule
-            y = int(groups[0])
-            return str(y)
-        elif len(groups) == 2:
-            g0, g1 = groups[0], groups[1]
-            # Format compact 2 chiffres chacun : "2627" → 26/27 → 2026-27
-            if len(g0) == 2 and len(g1) == 2:
-                y1 = int("20" + g0)
-                y2 = int("20" + g1)
-                if y2 == y1 + 1:
-                    return f"{y1}-{g1}"
-                # Pas consécutif → ignorer ce pattern
+        season = _season_from_groups(_SEASON_RES[i].fullmatch(hit[1]).groups())
+        if season:
+            break
+
+    # Retraits successifs des saisons (équivalent aux re.sub enchaînés) :
+    # un match n'est retenu que s'il ne chevauche pas un retrait précédent
+    for i in _SEASON_STRIP_ORDER:
+        last_end = -1
+        for start, end in strip_hits[i]:
+            if start < last_end:
                 continue
-            # Rétro XX-YY ou XXXX-YY
-            y1 = int(g0) if len(g0) == 4 else int("19" + g0)
-            y2 = int(g1) if len(g1) == 4 else (
-                int("20" + g1) if int(g1) < 50 else int("19" + g1)
-            )
-            return f"{y1}-{str(y2)[-2:]}"
-    return None
+            if any(start < r_end and r_start < end for r_start, r_end in removed):
+                continue
+            removed.append((start, end))
+            last_end = end
+
+    parts = []
+    cursor = 0
+    for start, end in sorted(removed):
+        parts.append(title[cursor:start])
+        cursor = end
+    parts.append(title[cursor:])
+
+    return {
+        "season":    season,
+        "type":      team_index().type_automaton.search(title.lower()) or "Unknown",
+        "sleeve":    "long" if long_sleeve else "short",
+        "team_span": "".join(parts).strip(),
+    }
+
+
+def extract_season(title: str) -> Optional[str]:
+    """Extrait la saison depuis un titre. Ex: '24-25 PSG' → '2024-25'"""
+    return parse_title(title)["season"]
 
 
 def extract_jersey_type(title: str) -> str:
     """Extrait le type de maillot (Home/Away/Third/etc.) depuis un titre."""
-    title_lower = title.lower()
-    for keyword, jersey_type in TYPE_MAPPING.items():
-        if keyword in title_lower:
-            return jersey_type
-    return "Unknown"
+    return team_index().type_automaton.search(title.lower()) or "Unknown"
 
 
 def extract_sleeve_type(title: str) -> str:
     """Détecte si le maillot est à manches longues."""
-    title_lower = title.lower()
-    for pattern in _LONG_SLEEVE_PATTERNS:
-        if re.search(pattern, title_lower):
-            return "long"
-    return "short"
+    return parse_title(title)["sleeve"]
 
 
 def find_team_exact(text: str) -> Optional[tuple[str, float]]:
@@ -1399,57 +1735,131 @@ def find_team_exact(text: str) -> Optional[tuple[str, float]]:
     Cherche une équipe par match exact sur les alias.
     Retourne (clé_team, score=1.0) ou None.
     """
+    index = team_index()
     t = text.lower().strip()
     # Match exact
-    if t in _ALIAS_INDEX:
-        return (_ALIAS_INDEX[t], 1.0)
-
-    # Chercher si un alias est contenu dans le texte
-    # (du plus long au plus court pour éviter les faux positifs)
-    text_norm = normalize_text(t)
-    candidates = sorted(_ALIAS_INDEX.keys(), key=len, reverse=True)
-    for alias in candidates:
-        # Autoriser les alias de 2 chars CJK (ex: 皇马, 巴西) ; filtrer seulement les alias Latin < 3 chars
-        if len(alias) < 2:
-            continue
-        if len(alias) == 2 and all(ord(c) < 0x4E00 for c in alias):
-            continue  # alias Latin de 2 chars → trop court, risque de faux positifs
-        alias_norm = normalize_text(alias)
-        if alias_norm in text_norm:
-            return (_ALIAS_INDEX[alias], 0.95)
+    if t in index.alias_index:
+        return (index.alias_index[t], 1.0)
+
+    # Chercher si un alias est contenu dans le texte (alias le plus long d'abord)
+    team_key = index.alias_automaton.search(normalize_text(t))
+    if team_key:
+        return (team_key, 0.95)
 
     return None
 
 
-def find_team_fuzzy(text: str, threshold: int = 75) -> Optional[tuple[str, float]]:
+def match_alias_fuzzy(text_norm: str, threshold: int) -> Optional[tuple[str, float]]:
     """
-    Fuzzy match sur tous les alias connus.
+    Fuzzy match d'un texte normalisé sur les alias présélectionnés par l'index n-grammes.
+    Textes très courts (FUZZY_FULL_SCAN_MAX_LEN) : si aucun alias présélectionné
+    n'atteint le seuil, repli sur tous les alias, car ils partagent trop peu de
+    bigrammes avec leur alias ("rian" → iran).
+    Retourne (clé_team, score sur 100) ou None si sous le seuil.
+    """
+    from rapidfuzz import fuzz, process
+
+    index  = team_index()
+    passes = [index.blocker.shortlist(text_norm)]
+    if len(text_norm) <= FUZZY_FULL_SCAN_MAX_LEN:
+        passes.append(index.aliases)
+    result = None
+    for choices in passes:
+        result = process.extractOne(
+            text_norm, choices, scorer=fuzz.token_set_ratio, score_cutoff=threshold,
+        )
+        if result:
+            break
+    if result:
+        matched_alias, score, _ = result
+        return (index.alias_index[matched_alias], score)
+    return None
+
+
+def find_team_fuzzy(text: str, threshold: int = FUZZY_THRESHOLD_TITLE) -> Optional[tuple[str, float]]:
+    """
+    Fuzzy match sur les alias connus.
     Retourne (clé_team, score/100) ou None si sous le seuil.
     """
     text_norm = normalize_text(text)
     if not text_norm or len(text_norm) < 3:
         return None
 
-    # Utiliser rapidfuzz pour trouver le meilleur match
-    result = process.extractOne(
-        text_norm,
-        _ALL_ALIASES,
-        scorer=fuzz.token_set_ratio,
-        score_cutoff=threshold,
-    )
-
+    result = match_alias_fuzzy(text_norm, threshold)
     if result:
-        matched_alias, score, _ = result
-        team_key = _ALIAS_INDEX[matched_alias]
+        team_key, score = result
         return (team_key, score / 100.0)
 
     return None
 
 
-def extract_team_from_title(title: str) -> Optional[tuple[str, float]]:
+def find_teams_fuzzy(
+    texts: list[str],
+    threshold: int = FUZZY_THRESHOLD_TITLE,
+    workers: int = 1,
+) -> list[Optional[tuple[str, float]]]:
+    """
+    Version par lots de find_team_fuzzy : les alias présélectionnés de tous les
+    textes sont scorés en un seul appel rapidfuzz (cpdist, paires texte/alias), puis
+    les textes courts restés sans match sur tous les alias (cdist), comme match_alias_fuzzy.
+    Résultats identiques à find_team_fuzzy appelé texte par texte.
+    workers : threads rapidfuzz (-1 = tous les cœurs).
+    """
+    results: list[Optional[tuple[str, float]]] = [None] * len(texts)
+    norms = [normalize_text(t) for t in texts]
+    todo  = [i for i, t in enumerate(norms) if len(t) >= 3]
+    if not todo:
+        return results
+
+    from rapidfuzz import fuzz, process
+
+    index      = team_index()
+    shortlists = [index.blocker.shortlist(norms[i]) for i in todo]
+    queries    = [norms[i] for i, shortlist in zip(todo, shortlists) for _ in shortlist]
+    choices    = [alias for shortlist in shortlists for alias in shortlist]
+    if choices:
+        scores = process.cpdist(
+            queries,
+            choices,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=threshold,
+            dtype="float64",
+            workers=workers,
+        )
+        start = 0
+        for i, shortlist in zip(todo, shortlists):
+            if shortlist:
+                row   = scores[start:start + len(shortlist)]
+                best  = int(row.argmax())    # premier maximum, comme extractOne
+                score = float(row[best])
+                if score >= threshold:
+                    results[i] = (index.alias_index[shortlist[best]], score / 100.0)
+            start += len(shortlist)
+
+    # Repli : textes courts sans alias présélectionné au-dessus du seuil → tous les alias
+    missed = [i for i in todo if results[i] is None and len(norms[i]) <= FUZZY_FULL_SCAN_MAX_LEN]
+    if missed:
+        scores = process.cdist(
+            [norms[i] for i in missed],
+            index.aliases,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=threshold,
+            dtype="float64",
+            workers=workers,
+        )
+        for i, row in zip(missed, scores):
+            best  = int(row.argmax())
+            score = float(row[best])
+            if score >= threshold:
+                results[i] = (index.alias_index[index.aliases[best]], score / 100.0)
+    return results
+
+
+def extract_team_from_title(title: str, cleaned: Optional[str] = None) -> Optional[tuple[str, float]]:
     """
     Méthode principale : tente d'extraire le nom d'équipe depuis un titre Yupoo.
     Essaie d'abord exact, puis fuzzy sur des sous-parties du titre.
+    cleaned : titre déjà nettoyé par parse_title (recalculé si absent).
     Retourne (clé_team, confidence) ou None.
     """
     if not title:
@@ -1460,21 +1870,9 @@ def extract_team_from_title(title: str) -> Optional[tuple[str, float]]:
     if result:
         return result
 
-    # 2. Nettoyer le titre et tenter un fuzzy match sur des portions
-    # Retirer les infos de saison et type pour isoler le nom d'équipe
-    cleaned = title
-    # Retirer les saisons
-    cleaned = re.sub(r"\b(20)?\d{2}[/-](20)?\d{2}\b", "", cleaned)
-    cleaned = re.sub(r"\b(202[0-9])\b", "", cleaned)
-    cleaned = re.sub(r"\b(19\d{2})[/-]\d{2,4}\b", "", cleaned)
-    # Retirer les mots de type
-    type_words = list(TYPE_MAPPING.keys())
-    for w in sorted(type_words, key=len, reverse=True):
-        cleaned = re.sub(r"\b" + re.escape(w) + r"\b", "", cleaned, flags=re.IGNORECASE)
-    # Retirer mots génériques
-    for w in ["jersey", "shirt", "kit", "maillot", "version", "fan", "player", "retro", "long", "sleeve", "ml"]:
-        cleaned = re.sub(r"\b" + re.escape(w) + r"\b", "", cleaned, flags=re.IGNORECASE)
-    cleaned = cleaned.strip()
+    # 2. Titre sans saison, type ni mots génériques → isoler le nom d'équipe
+    if cleaned is None:
+        cleaned = parse_title(title)["team_span"]
 
     if cleaned:
         result = find_team_exact(cleaned)
@@ -1520,6 +1918,17 @@ def extract_product_info(title: str, version: str = "fan") -> dict:
             "matched":          True,
         }
     """
+    parsed = parse_title(title)
+    return _product_info(title, version, parsed, extract_team_from_title(title, parsed["team_span"]))
+
+
+def _product_info(
+    title: str,
+    version: str,
+    parsed: dict,
+    team_result: Optional[tuple[str, float]],
+) -> dict:
+    """Assemble le dict d'extract_product_info depuis parse_title et le match d'équipe."""
     result = {
         "team":         "Unknown",
         "team_short":   "Unknown",
@@ -1527,17 +1936,15 @@ def extract_product_info(title: str, version: str = "fan") -> dict:
         "team_aliases": [],
         "league":       "",
         "country":      "",
-        "season":       extract_season(title) or "",
-        "type":         extract_jersey_type(title),
+        "season":       parsed["season"] or "",
+        "type":         parsed["type"],
         "version":      version,
-        "sleeve":       extract_sleeve_type(title),
+        "sleeve":       parsed["sleeve"],
         "confidence":   0.0,
         "matched":      False,
         "raw_title":    title,
     }
 
-    # Extraire l'équipe
-    team_result = extract_team_from_title(title)
     if team_result:
         team_key, confidence = team_result
         team_data = get_team_info(team_key)
@@ -1555,6 +1962,201 @@ def extract_product_info(title: str, version: str = "fan") -> dict:
     return result
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# CACHE D'EXTRACTION PERSISTANT
+# ══════════════════════════════════════════════════════════════════════════════
+
+# À incrémenter quand la logique d'extraction change (invalide le cache)
+_EXTRACTION_VERSION = 1
+
+
+def team_database_fingerprint() -> str:
+    """Empreinte de TEAM_DATABASE + TYPE_MAPPING : change dès qu'une équipe ou un type est modifié."""
+    import hashlib
+    import json
+
+    payload = json.dumps(
+        [_EXTRACTION_VERSION, TEAM_DATABASE, TYPE_MAPPING],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_title(title: str) -> str:
+    """Clé de cache d'un titre (la casse et les espaces de bord n'influent pas sur l'extraction)."""
+    return title.strip().lower()
+
+
+class ExtractionCache:
+    """
+    Cache SQLite des résultats d'extract_product_info entre deux constructions.
+    Clé : (titre normalisé, version, empreinte de la base d'équipes) — les entrées
+    d'une ancienne empreinte sont purgées à l'ouverture.
+    """
+
+    def __init__(self, path: Path):
+        import sqlite3
+
+        self.path        = path
+        self.fingerprint = team_database_fingerprint()
+        self.hits        = 0
+        self.misses      = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                title       TEXT NOT NULL,
+                version     TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                info        TEXT NOT NULL,    -- JSON extract_product_info
+                PRIMARY KEY (title, version, fingerprint)
+            )
+        """)
+        self._conn.execute("DELETE FROM extractions WHERE fingerprint != ?", (self.fingerprint,))
+        self._conn.commit()
+
+    def get_many(self, pairs: list[tuple[str, str]]) -> dict[tuple[str, str], dict]:
+        """Retourne {(titre, version): info} pour les paires présentes dans le cache."""
+        import json
+
+        rows = self._conn.execute(
+            "SELECT title, version, info FROM extractions WHERE fingerprint = ?",
+            (self.fingerprint,),
+        )
+        stored = {(title, version): info for title, version, info in rows}
+
+        found = {}
+        for title, version in pairs:
+            info = stored.get((_cache_title(title), version))
+            if info is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[(title, version)] = json.loads(info)
+        return found
+
+    def put_many(self, infos: dict[tuple[str, str], dict]):
+        """Enregistre {(titre, version): info} dans le cache."""
+        import json
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?)",
+            [
+                (_cache_title(title), version, self.fingerprint, json.dumps(info, ensure_ascii=False))
+                for (title, version), info in infos.items()
+            ],
+        )
+        self._conn.commit()
+
+    def stats(self) -> str:
+        """Résumé hits/misses pour les logs."""
+        total = self.hits + self.misses
+        rate  = self.hits / total * 100 if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% de hits)"
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EXTRACTION PAR LOTS
+# ══════════════════════════════════════════════════════════════════════════════
+
+# En dessous de ce nombre de titres uniques par processus, le pool coûte plus qu'il ne rapporte
+_MIN_TITLES_PER_WORKER = 200
+
+
+def _extract_batch(titles: list[str], fuzzy_workers: int = 1) -> list[dict]:
+    """
+    Analyse d'un lot de titres : mêmes étapes qu'extract_team_from_title, mais chaque
+    étape fuzzy est un seul appel matriciel pour tous les titres encore non résolus.
+    """
+    parsed = [parse_title(title) for title in titles]
+    teams: list[Optional[tuple[str, float]]] = [None] * len(titles)
+
+    # 1. Match exact sur le titre entier, puis sur le titre nettoyé
+    for i, title in enumerate(titles):
+        if not title:
+            continue
+        teams[i] = find_team_exact(title)
+        if teams[i] is None and parsed[i]["team_span"]:
+            teams[i] = find_team_exact(parsed[i]["team_span"])
+
+    # 2. Fuzzy sur les titres nettoyés, puis 3. sur les titres entiers
+    for use_cleaned in (True, False):
+        todo = [
+            i for i, title in enumerate(titles)
+            if title and teams[i] is None and (parsed[i]["team_span"] or not use_cleaned)
+        ]
+        texts = [parsed[i]["team_span"] if use_cleaned else titles[i] for i in todo]
+        for i, result in zip(todo, find_teams_fuzzy(texts, workers=fuzzy_workers)):
+            teams[i] = result
+
+    return [
+        _product_info(title, "fan", p, team)
+        for title, p, team in zip(titles, parsed, teams)
+    ]
+
+
+def _extract_titles(titles: list[str], workers: Optional[int]) -> list[dict]:
+    """Analyse des titres uniques, sur un pool de processus si le lot le justifie."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(titles) // _MIN_TITLES_PER_WORKER)
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        size   = -(-len(titles) // workers)
+        chunks = [titles[i:i + size] for i in range(0, len(titles), size)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(chain.from_iterable(pool.map(_extract_batch, chunks)))
+        except (OSError, BrokenProcessPool) as e:
+            log.warning(f"Pool de processus indisponible ({e}), extraction séquentielle")
+    return _extract_batch(titles, fuzzy_workers=-1)
+
+
+def extract_products_info(
+    items: list[tuple[str, str]],
+    workers: Optional[int] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> list[dict]:
+    """
+    Analyse un lot de titres d'albums en une fois.
+    Les titres en double (fréquents entre fan_hongpin, fan_tang et retro) ne sont
+    analysés qu'une seule fois, répartis sur un pool de processus.
+
+    Args:
+        items:   liste de (titre, version)
+        workers: nombre de processus (None = nombre de cœurs, 1 = séquentiel)
+        cache:   cache persistant consulté avant l'extraction (optionnel)
+
+    Returns:
+        Liste de dicts extract_product_info, dans l'ordre de items.
+    """
+    pairs  = list(dict.fromkeys(items))
+    cached = cache.get_many(pairs) if cache is not None else {}
+
+    todo   = [pair for pair in pairs if pair not in cached]
+    titles = list(dict.fromkeys(title for title, _ in todo))
+    by_title = dict(zip(titles, _extract_titles(titles, workers)))
+    fresh = {(title, version): {**by_title[title], "version": version} for title, version in todo}
+    if cache is not None and fresh:
+        cache.put_many(fresh)
+
+    log.debug(f"{len(items)} titres, {len(titles)} analysés, {len(cached)} depuis le cache")
+
+    infos = {**cached, **fresh}
+    return [{**infos[(title, version)], "raw_title": title} for title, version in items]
+
+
 # ── Tests rapides ─────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     test_titles = [
@@ -0,0 +1,64 @@
+"""
+Catalogue synthétique commun aux tests de l'API de recherche.
+Lancer depuis EliteKits/ : python -m pytest -q scraper/tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import search_engine as se
+
+
+# ── Catalogue synthétique ─────────────────────────────────────────────────────
+
+TEAMS = [
+    ("psg",         "Paris Saint-Germain", "PSG",         "Ligue 1",       "France", ["psg", "paris saint-germain", "paris"]),
+    ("real madrid", "Real Madrid CF",      "Real Madrid", "La Liga",       "Spain",  ["real madrid", "real", "madrid"]),
+    ("barcelona",   "FC Barcelona",        "Barcelona",   "La Liga",       "Spain",  ["barcelona", "barca", "fc barcelona"]),
+    ("france",      "France",              "France",      "International", "France", ["france", "les bleus"]),
+]
+VERSIONS = ("fan", "player", "retro")
+TYPES    = ("Home", "Away", "Third")
+
+
+def make_products(count: int = 48, price_offset: int = 0) -> list[dict]:
+    """Produits au format de products.json : équipes, saisons, prix et dates variés."""
+    products = []
+    for n in range(count):
+        team_key, team, short, league, country, aliases = TEAMS[n % len(TEAMS)]
+        version = VERSIONS[n % len(VERSIONS)]
+        season  = f"{2018 + n % 7}-{19 + n % 7}"
+        products.append({
+            "id":           f"{version}_{team_key.replace(' ', '_')}_{n:04d}",
+            "team":         team,
+            "team_short":   short,
+            "team_key":     team_key,
+            "team_aliases": aliases,
+            "league":       league,
+            "country":      country,
+            "season":       season,
+            "type":         TYPES[n % len(TYPES)],
+            "version":      version,
+            "sleeve":       "long" if n % 5 == 0 else "short",
+            "price":        20 + (n * 7) % 30 + price_offset,
+            "currency":     "EUR",
+            "images":       [f"https://example.com/{n}.jpeg"],
+            "thumbnail":    f"https://example.com/{n}.jpeg",
+            "source_url":   f"https://example.com/albums/{n}",
+            "album_id":     str(1000 + n),
+            "catalog_id":   f"{version}_test",
+            "raw_title":    f"{season} {short} {TYPES[n % len(TYPES)]}",
+            "tags":         sorted({*aliases, league.lower(), country.lower(), version}),
+            "confidence_score": 0.95,
+            "matched":      True,
+            "created_at":   f"2026-01-{1 + (n * 11) % 28:02d}T10:{n % 60:02d}:00",
+        })
+    return products
+
+
+def build_index(products: list[dict]) -> se.SearchIndex:
+    idx = se.SearchIndex()
+    idx.products = products
+    idx.reindex()
+    return idx
@@ -0,0 +1,100 @@
+"""
+Parité des backends de recherche : le même catalogue synthétique, indexé en
+mémoire (SearchIndex.reindex), ouvert depuis une image écrite sur disque
+(CatalogImage) et depuis products.db (_save_to_sqlite + SqliteIndex), doit
+donner les mêmes résultats, totaux et curseurs.
+"""
+import pytest
+
+import search_engine as se
+from catalog_image import SORT_KEYS, write_catalog_image
+from conftest import build_index, make_products
+from database_builder import _save_to_sqlite
+
+QUERIES = ["", "psg", "real madrid", "barca", "barcleona", "les bleus", "madrid 2021",
+           "home", "la liga away", "player", "2020", "xyz"]
+FILTERS = [
+    {},
+    {"version": "retro"},
+    {"country": "spain"},
+    {"league": "liga"},
+    {"season": "2022"},
+    {"jersey_type": "away"},
+    {"version": "fan", "league": "ligue 1"},
+]
+SORTS = [None, *(name for name in SORT_KEYS if name != "relevance")]
+# Sans requête ni filtre : navigation (first_ids), voir test_backends_agree_on_browse
+CASES = [(q, filters) for q in QUERIES for filters in FILTERS if q or filters]
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    """Les trois index sur le même catalogue."""
+    products = make_products(count=90)
+    tmp = tmp_path_factory.mktemp("catalog")
+
+    write_catalog_image(products, tmp / "catalog.img")
+    image = se.SearchIndex()
+    image.load_image(tmp / "catalog.img")
+
+    _save_to_sqlite(products, tmp / "products.db")
+    sqlite = se.SqliteIndex()
+    assert sqlite.load(tmp / "products.db") == len(products)
+
+    return {"memory": build_index(products), "image": image, "sqlite": sqlite}
+
+
+def _cursor_position(idx, cursor):
+    """Dernier produit servi et valeur de tri d'un curseur (sans génération ni ordinal interne)."""
+    if cursor is None:
+        return None
+    _, sort_key, product_id = se._decode_cursor(cursor)
+    return product_id, (0, *sort_key)[-2]
+
+
+def _pages(idx, q, filters, sort, per_page=7):
+    """Pages successives (par numéro puis par curseur) : ids, total et curseurs."""
+    pages, cursor = [], None
+    for page in range(1, 20):
+        by_page = idx.search(q, page=page, per_page=per_page, sort=sort, **filters)
+        ids     = [p["id"] for p in idx.products_for(by_page["ids"])]
+        pages.append((ids, by_page["total"], by_page["total_pages"], _cursor_position(idx, by_page["next_cursor"])))
+        if page > 1:
+            by_cursor = idx.search(q, per_page=per_page, sort=sort, cursor=cursor, **filters)
+            assert [p["id"] for p in idx.products_for(by_cursor["ids"])] == ids
+        cursor = by_page["next_cursor"]
+        if cursor is None:
+            break
+    return pages
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("q, filters", CASES)
+def test_backends_agree_on_search(backends, q, filters, sort):
+    expected = _pages(backends["memory"], q, filters, sort)
+    assert _pages(backends["image"], q, filters, sort) == expected
+    assert _pages(backends["sqlite"], q, filters, sort) == expected
+
+
+@pytest.mark.parametrize("sort", SORTS)
+def test_backends_agree_on_browse(backends, sort):
+    results = {
+        name: [p["id"] for p in idx.products_for(idx.first_ids(25, sort))]
+        for name, idx in backends.items()
+    }
+    assert len(results["memory"]) == 25
+    assert results["image"] == results["memory"]
+    assert results["sqlite"] == results["memory"]
+
+
+def test_backends_agree_on_aggregates(backends):
+    memory = backends["memory"]
+    for name in ("image", "sqlite"):
+        idx = backends[name]
+        assert len(idx) == len(memory)
+        assert idx.etag == memory.etag
+        assert idx.team_records == memory.team_records
+        assert idx.team_counts == memory.team_counts
+        assert idx.stats == memory.stats
+        assert (idx.leagues, idx.countries, idx.seasons, idx.versions) == \
+            (memory.leagues, memory.countries, memory.seasons, memory.versions)
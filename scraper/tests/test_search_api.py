@@ -0,0 +1,251 @@
+"""
+Tests de l'API de recherche (search_engine) sur un petit catalogue synthétique
+indexé en mémoire, sans products.json ni serveur lancé.
+"""
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import search_engine as se
+from catalog_image import SORT_KEYS
+from conftest import build_index, make_products
+from team_extractor import match_alias_fuzzy
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Index en mémoire installé comme index global, cache vidé."""
+    idx = build_index(make_products())
+    monkeypatch.setattr(se, "index", idx)
+    se.search_cache.clear()
+    yield idx
+    se.search_cache.clear()
+
+
+@pytest.fixture
+def client(index):
+    # Sans bloc with : pas d'événement startup (ni chargement disque, ni surveillance)
+    return TestClient(se.app)
+
+
+def result_ids(response) -> list[str]:
+    assert response.status_code == 200, response.text
+    return [p["id"] for p in response.json()["results"]]
+
+
+# ── Cache par génération ──────────────────────────────────────────────────────
+
+def test_cache_entry_is_stale_after_generation_bump():
+    cache = se.SearchCache(maxsize=8, ttl=60)
+    cache.put(("psg",), 1, "résultat")
+    assert cache.get(("psg",), 1) == "résultat"
+    assert cache.get(("psg",), 2) is None
+    # L'entrée obsolète est supprimée, pas seulement ignorée
+    assert cache.get(("psg",), 1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_new_index_generation_bypasses_cached_search(client, index, monkeypatch):
+    params = {"q": "psg", "limit": 60}
+    before = client.get("/api/search", params=params).json()["results"]
+    assert client.get("/api/search", params=params).json()["results"] == before
+    assert se.search_cache.stats()["hits"] >= 1
+
+    # Nouvel index installé sans vider le cache : seule la génération l'invalide
+    repriced = build_index(make_products(price_offset=100))
+    assert repriced.generation > index.generation
+    monkeypatch.setattr(se, "index", repriced)
+    after = client.get("/api/search", params=params).json()["results"]
+    assert [p["id"] for p in after] == [p["id"] for p in before]
+    assert [p["price"] for p in after] == [p["price"] + 100 for p in before]
+
+
+def test_swap_index_clears_cache(index):
+    se.search_cache.put(("psg",), index.generation, {"ids": []})
+    se.swap_index(build_index(make_products()))
+    assert se.search_cache.stats()["size"] == 0
+
+
+# ── Pagination ────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("sort", [None, "newest", "price", "season"])
+def test_cursor_pages_equal_offset_pages(client, sort):
+    params = {"q": "la liga", "limit": 5, **({"sort": sort} if sort else {})}
+    first = client.get("/api/search", params=params).json()
+    total_pages = first["total_pages"]
+    assert total_pages > 2
+
+    cursor = first["next_cursor"]
+    for page in range(2, total_pages + 1):
+        by_offset = client.get("/api/search", params={**params, "page": page})
+        by_cursor = client.get("/api/search", params={**params, "cursor": cursor})
+        assert result_ids(by_cursor) == result_ids(by_offset)
+        cursor = by_cursor.json()["next_cursor"]
+    assert cursor is None
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/search", params={"q": "psg", "cursor": "pas-un-curseur"})
+    assert response.status_code == 400
+
+
+# ── ETag / 304 ────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("path", ["/api/filters", "/api/teams", "/api/search"])
+def test_static_endpoints_answer_304_on_matching_etag(client, index, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == index.etag
+
+    cached = client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert client.get(path, headers={"If-None-Match": 'W/"autre"'}).status_code == 200
+
+
+@pytest.mark.parametrize("params", [{"limit": 40}, {"q": "la liga"}])
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip",                 "gzip"),
+    ("gzip;q=0",             None),
+    ("gzip; q=0",            None),
+    ("gzip;q=0.0, identity", None),
+    ("br;q=0, gzip;q=0.5",   "gzip"),
+    ("identity",             None),
+])
+def test_accept_encoding_honours_q_values(client, params, accept, encoding):
+    response = client.get("/api/search", params=params, headers={"Accept-Encoding": accept})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+
+
+def test_etag_changes_with_catalog_content(index):
+    assert build_index(make_products()).etag == index.etag
+    assert build_index(make_products(price_offset=1)).etag != index.etag
+
+
+# ── Pool CPU borné ────────────────────────────────────────────────────────────
+
+def test_saturated_pool_answers_503(index, monkeypatch):
+    pool = se.CpuPool(workers=1, max_pending=1, budget=5)
+    monkeypatch.setattr(se, "cpu_pool", pool)
+
+    async def scenario():
+        release = threading.Event()
+        blocker = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)   # la tâche bloquante occupe la seule place
+        try:
+            transport = httpx.ASGITransport(app=se.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await http.get("/api/search", params={"q": "barcelona"})
+        finally:
+            release.set()
+            await blocker
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    assert pool.stats()["rejected"] == 1
+    pool.shutdown()
+
+
+def test_pool_over_budget_raises_overloaded():
+    pool = se.CpuPool(workers=1, max_pending=4, budget=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(se.Overloaded):
+            await pool.run(release.wait)
+        release.set()
+
+    asyncio.run(scenario())
+    assert pool.stats()["timeouts"] == 1
+    pool.shutdown()
+
+
+# ── Recherches groupées ───────────────────────────────────────────────────────
+
+def test_batch_equals_individual_searches(client):
+    queries = [
+        {"q": "psg", "limit": 5},
+        {"q": "real madrid", "version": "player"},
+        {"q": "barcelona", "sort": "price", "limit": 4, "page": 2},
+        {"q": "psg", "limit": 5},                       # doublon du lot
+        {"league": "La Liga", "view": "card"},
+        {"q": "france", "fields": "id,price"},
+        {"sort": "newest", "limit": 3},                 # sans requête
+    ]
+    batch = client.post("/api/search/batch", json={"queries": queries})
+    assert batch.status_code == 200, batch.text
+    searches = batch.json()["searches"]
+    assert len(searches) == len(queries)
+
+    se.search_cache.clear()
+    for query, from_batch in zip(queries, searches):
+        assert client.get("/api/search", params=query).json() == from_batch
+
+
+def test_batch_rejects_invalid_query(client):
+    response = client.post("/api/search/batch", json={"queries": [{"q": "psg"}, {"q": "psg", "sort": "??"}]})
+    assert response.status_code == 400
+    assert "queries[1]" in response.json()["detail"]
+
+
+# ── Tris ──────────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("sort", ["newest", "price", "price_desc", "season"])
+def test_sort_order(client, sort):
+    response = client.get("/api/search", params={"league": "La Liga", "sort": sort, "limit": 200})
+    results = response.json()["results"]
+    assert len(results) == response.json()["total"] > 1
+
+    # Clé croissante, départage par ordre du catalogue
+    key = SORT_KEYS[sort]
+    catalog  = [(key(p), n, p) for n, p in enumerate(make_products()) if p["league"] == "La Liga"]
+    expected = [p for _, _, p in sorted(catalog, key=lambda t: t[:2])]
+    assert [p["id"] for p in results] == [p["id"] for p in expected]
+
+
+@pytest.mark.parametrize("sort", ["newest", "price"])
+def test_sort_without_query_uses_precomputed_order(client, sort):
+    results = client.get("/api/search", params={"sort": sort, "limit": 10}).json()["results"]
+    keys = [SORT_KEYS[sort](p) for p in results]
+    assert len(results) == 10
+    assert keys == sorted(keys)
+
+
+def test_browse_body_is_built_only_on_cache_miss(client, index, monkeypatch):
+    calls = []
+    first_ids = index.first_ids
+    monkeypatch.setattr(index, "first_ids", lambda *args: calls.append(args) or first_ids(*args))
+
+    params = {"sort": "price", "limit": 10}
+    etag = client.get("/api/search", params=params).headers["etag"]
+    assert client.get("/api/search", params=params).status_code == 200          # corps en cache
+    assert client.get("/api/search", params=params, headers={"If-None-Match": etag}).status_code == 304
+    assert calls == [(10, "price")]
+
+
+def test_unknown_sort_is_rejected(client):
+    assert client.get("/api/search", params={"q": "psg", "sort": "cheapest"}).status_code == 400
+
+
+# ── Résolution des équipes ────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("query, team_key", [
+    ("barcleona", "barcelona"),
+    ("frnace",    "france"),
+    ("bayer",     "bayer leverkusen"),
+    ("bleus",     "france"),
+    ("leens",     "lens"),
+])
+def test_resolve_team_query(query, team_key):
+    assert se.resolve_team_query(query) == team_key
+
+
+@pytest.mark.parametrize("text, team_key", [("rian", "iran"), ("rela", "real madrid")])
+def test_fuzzy_shortlist_falls_back_to_full_scan(text, team_key):
+    assert match_alias_fuzzy(text, 75)[0] == team_key